@@ -0,0 +1,97 @@
+"""
+Benchmark for the filename parser in DLSite Collection Helper.
+
+Parses a corpus of generated filenames with the precompiled parse_filename
+and with the previous multi-regex implementation, checks that both agree on
+every name, and reports their throughput.
+
+Usage:
+    python benchmarks/bench_filename_parser.py [corpus size]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from file_utils import parse_filename  # noqa: E402
+
+DEFAULT_CORPUS_SIZE = 1_000_000
+REPEATS = 3
+
+def legacy_extract_id_and_version(filename: str) -> Tuple[Optional[str], Optional[str]]:
+    """The previous parser: splitext plus up to three uncompiled searches per name."""
+    name_without_ext = os.path.splitext(filename)[0]
+    rj_match = re.search(r'(RJ\d+)', name_without_ext)
+    if not rj_match:
+        return None, None
+    dlsite_id = rj_match.group(1)
+    version_match = re.search(r'\((v?(\d+(\.\d+)*))\)', name_without_ext)
+    if not version_match:
+        version_match = re.search(r'\((\d+(\.\d+)*)\)', name_without_ext)
+    if version_match:
+        raw_version = version_match.group(1)
+        version = raw_version[1:] if raw_version.lower().startswith('v') else raw_version
+        version = f"v{version}"
+    else:
+        version = None
+    return dlsite_id, version
+
+def make_corpus(size: int) -> List[str]:
+    """Generate filenames in the shapes found in real libraries."""
+    titles = ["Title", "Some Long Work Title [Circle]", "作品名", "(Bonus) Extra", "Voice Drama"]
+    extensions = [".zip", ".rar", ".7z", "", ".tar.gz", ".part1.rar"]
+    names = []
+    for _ in range(size):
+        dlsite_id = f"RJ{random.randint(1, 99_999_999):0{random.choice((6, 8))}d}"
+        version = random.choice(["", " (v1.0)", " (1.2.3)", " (v2)", "(V1.0)", " (ver 1)"])
+        shape = random.random()
+        if shape < 0.6:
+            name = f"{dlsite_id}{version}"
+        elif shape < 0.9:
+            name = f"{random.choice(titles)} {dlsite_id}{version}"
+        else:
+            name = f"{random.choice(titles)}{version}"
+        names.append(name + random.choice(extensions))
+    return names
+
+def time_parser(parse: Callable[[str], Tuple[Optional[str], Optional[str]]], names: List[str]) -> float:
+    """
+    Parse every name REPEATS times and return the best elapsed time.
+
+    Results are discarded right away, like the scanner does, so the timing
+    isn't dominated by garbage collection of a million retained results.
+    """
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for name in names:
+            parse(name)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    """Run the benchmark on a corpus of the size given on the command line."""
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CORPUS_SIZE
+    random.seed(0)
+    names = make_corpus(size)
+
+    mismatches = [name for name in names
+                  if tuple(parse_filename(name)) != legacy_extract_id_and_version(name)]
+    if mismatches:
+        print(f"{len(mismatches)} mismatches, e.g. {mismatches[:5]}")
+
+    legacy_time = time_parser(legacy_extract_id_and_version, names)
+    new_time = time_parser(parse_filename, names)
+
+    print(f"{size:,} filenames")
+    print(f"legacy parser:      {legacy_time:6.2f}s ({size / legacy_time:12,.0f} names/s)")
+    print(f"compiled parser:    {new_time:6.2f}s ({size / new_time:12,.0f} names/s)")
+    print(f"speedup:            {legacy_time / new_time:6.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark for table updates in DLSite Collection Helper.
+
+Measures how long it takes to apply a single edited row to the table, once
+through the virtualized table's diff-based update and once by rebuilding a
+plain Treeview the way the table used to be refreshed. The virtualized edit
+latency should stay flat as the number of rows grows. After the edits, the
+table model is checked for consistency.
+
+Needs a display, since it creates a (withdrawn) Tk window.
+
+Usage:
+    python benchmarks/bench_table_updates.py [sizes...]
+"""
+
+import os
+import random
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+from typing import Any, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from file_utils import pack_version  # noqa: E402
+from gui import format_table_row, row_sort_fields  # noqa: E402
+from table_view import VirtualTable  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+EDITS = 50
+
+def make_rows(count: int) -> List[Tuple[Any, ...]]:
+    """Generate random table rows as selected by fetch_table_rows."""
+    rows = []
+    for rowid in range(1, count + 1):
+        number = random.randint(1, 99_999_999)
+        version = f"v1.{random.randint(0, 9)}"
+        rows.append((rowid, f"RJ{number:08d}", random.choice(("Yes", "No")),
+                     version, random.randint(0, 1), "RJ", number, pack_version(version)))
+    return rows
+
+def edit(row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    """Return a copy of a row with a new tested status and ID, as after an edit."""
+    number = random.randint(1, 99_999_999)
+    return (row[0], f"RJ{number:08d}", "No" if row[2] == "Yes" else "Yes",
+            row[3], row[4], "RJ", number, row[7])
+
+def bench_virtual(root: tk.Tk, rows: List[Tuple[Any, ...]]) -> Tuple[float, float]:
+    """Time the initial load and the average single-row edit of the virtualized table."""
+    frame = ttk.Frame(root)
+    table = VirtualTable(frame, ("ID", "Tested", "Version"), format_table_row, row_sort_fields)
+    table.pack(fill=tk.BOTH, expand=True)
+    frame.pack(fill=tk.BOTH, expand=True)
+
+    start = time.perf_counter()
+    table.set_rows(rows)
+    root.update()
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(EDITS):
+        table.upsert_rows([edit(random.choice(rows))])
+        root.update_idletasks()
+    per_edit = (time.perf_counter() - start) / EDITS
+    check_model(table)
+    frame.destroy()
+    return load, per_edit
+
+def check_model(table: VirtualTable) -> None:
+    """
+    Check that the table model is consistent after the edits.
+
+    Edits move rows to new sort positions; every row must keep its cached
+    sort fields, or re-sorting and deleting it fails.
+    """
+    rowids = [row[0] for row in table.rows]
+    assert table.keys == sorted(table.keys), "model keys are not sorted"
+    assert set(table.row_keys) == set(rowids), "row keys do not match the rows"
+    assert set(table.row_fields) == set(rowids), "cached sort fields do not match the rows"
+    # Re-sorting rebuilds every key from the cached fields
+    sort_order = table.sort_order
+    table.set_sort((1, 0), table.reverse)
+    table.set_sort(sort_order, table.reverse)
+    table.remove_rows(rowids[:EDITS])
+    assert len(table.rows) == len(rowids) - EDITS, "rows were not removed"
+
+def bench_rebuild(root: tk.Tk, rows: List[Tuple[Any, ...]]) -> Tuple[float, float]:
+    """Time the initial load and a single-row edit done by rebuilding a plain Treeview."""
+    tree = ttk.Treeview(root, columns=("ID", "Tested", "Version"), show="headings")
+    tree.pack(fill=tk.BOTH, expand=True)
+
+    def rebuild() -> None:
+        tree.delete(*tree.get_children())
+        for row in sorted(rows, key=row_sort_fields, reverse=True):
+            tree.insert("", "end", iid=row[0], values=format_table_row(row))
+
+    start = time.perf_counter()
+    rebuild()
+    root.update()
+    load = time.perf_counter() - start
+
+    # Rebuilding is slow, so a few edits are enough for a stable average
+    edits = 3
+    start = time.perf_counter()
+    for _ in range(edits):
+        index = random.randrange(len(rows))
+        rows[index] = edit(rows[index])
+        rebuild()
+        root.update_idletasks()
+    per_edit = (time.perf_counter() - start) / edits
+    tree.destroy()
+    return load, per_edit
+
+def main() -> None:
+    """Run the benchmark for every size given on the command line."""
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    root = tk.Tk()
+    root.geometry("800x600")
+    root.withdraw()
+
+    print(f"{'rows':>10} {'virtual load':>14} {'virtual edit':>14} {'rebuild load':>14} {'rebuild edit':>14}")
+    for size in sizes:
+        rows = make_rows(size)
+        virtual_load, virtual_edit = bench_virtual(root, list(rows))
+        rebuild_load, rebuild_edit = bench_rebuild(root, list(rows))
+        print(f"{size:>10,} {virtual_load * 1000:>12.1f}ms {virtual_edit * 1000:>12.3f}ms "
+              f"{rebuild_load * 1000:>12.1f}ms {rebuild_edit * 1000:>12.1f}ms")
+    root.destroy()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Backup module for DLSite Collection Helper.
+
+This module backs up the database while the application keeps using it.
+Backups go through the SQLite online backup API on a background thread, so
+startup does not wait for a large database to be copied. The copy advances a
+limited number of pages per step inside a single read transaction, which
+with WAL journaling keeps the copy consistent while the GUI keeps writing.
+
+Snapshots are stored gzip-compressed and listed in a manifest file that
+records their time, size, content hash and the database's change counter,
+so the backup directory is only listed once, to adopt the backups of older
+versions. Triggers on dlsite_ids count every change to the entries; a
+backup is skipped when the counter matches the newest snapshot, and a copy
+whose content matches a stored snapshot is not stored again. Old snapshots
+are thinned out by a tiered retention policy.
+
+Functions:
+    start_backup: Back up the database on a background thread
+    wait_for_backup: Wait for a running background backup to finish
+    backup_database: Back up the database if it changed since the last backup
+    store_snapshot: Add a database copy to the backup store
+    load_manifest: Load the list of stored snapshots
+    save_manifest: Write the list of stored snapshots
+    select_retained: Choose the snapshots kept by the retention policy
+    prune_backups: Delete the snapshots not kept by the retention policy
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from config import DEBUG_ENABLED
+from database import DB_FILE, open_worker_connection, load_state
+
+BACKUP_DIR = "db-backup"
+MANIFEST_FILE = os.path.join(BACKUP_DIR, "manifest.json")
+BACKUP_PREFIX = "dlsite_ids_backup_"
+BACKUP_SUFFIX = ".db.gz"
+# Uncompressed backups written by older versions, adopted into the manifest
+LEGACY_BACKUP = re.compile(r'dlsite_ids_backup_(\d{14})\.db')
+# Files are written under a temporary name and renamed once complete. The
+# names are fixed, so files left by an interrupted backup are found without
+# listing the directory.
+TEMP_SUFFIX = ".tmp"
+COPY_FILE = os.path.join(BACKUP_DIR, f"{BACKUP_PREFIX}copy.db{TEMP_SUFFIX}")
+COMPRESSED_FILE = os.path.join(BACKUP_DIR, f"{BACKUP_PREFIX}new{BACKUP_SUFFIX}{TEMP_SUFFIX}")
+TEMP_FILES = (COPY_FILE, COMPRESSED_FILE, MANIFEST_FILE + TEMP_SUFFIX)
+# Pages copied per backup step (4 MB with the default page size)
+BACKUP_STEP_PAGES = 1024
+# Higher levels barely shrink a database of short IDs but take much longer
+COMPRESS_LEVEL = 6
+CHUNK_SIZE = 1024 * 1024
+
+# Snapshots kept: the newest 'recent' ones, plus the newest one in each of the
+# last N hours, days and weeks. Overridden by backup_retention in config.json.
+DEFAULT_RETENTION = {'recent': 3, 'hourly': 24, 'daily': 7, 'weekly': 4}
+RETENTION_PERIODS = {'hourly': 3600, 'daily': 86400, 'weekly': 7 * 86400}
+
+_backup_thread: Optional[threading.Thread] = None
+
+def start_backup(retention: Optional[Dict[str, int]] = None) -> None:
+    """
+    Back up the database on a background thread.
+
+    Does nothing if a backup is already running or there is no database yet.
+    Errors are printed instead of raised, since nothing waits for the result.
+
+    Args:
+        retention: Retention counts overriding entries of DEFAULT_RETENTION
+    """
+    global _backup_thread
+    if _backup_thread is not None and _backup_thread.is_alive():
+        return
+    if not os.path.exists(DB_FILE):
+        return
+    _backup_thread = threading.Thread(target=run_backup, args=(retention,), name="database-backup")
+    _backup_thread.start()
+
+def run_backup(retention: Optional[Dict[str, int]]) -> None:
+    """Run backup_database, printing errors; the target of the backup thread."""
+    try:
+        backup_database(retention)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Database backup failed: {e}")
+
+def wait_for_backup(timeout: Optional[float] = None) -> None:
+    """
+    Wait for a running background backup to finish.
+
+    Args:
+        timeout: Maximum number of seconds to wait, or None to wait until done
+    """
+    if _backup_thread is not None:
+        _backup_thread.join(timeout)
+
+def backup_database(retention: Optional[Dict[str, int]] = None,
+                    force: bool = False) -> Optional[str]:
+    """
+    Back up the database if it changed since the last backup.
+
+    Opens its own connection, so it can run on any thread.
+
+    Args:
+        retention: Retention counts overriding entries of DEFAULT_RETENTION
+        force: Back up even if no entry changed
+
+    Returns:
+        Path of the new snapshot, or None if nothing was stored
+    """
+    snapshots = load_manifest()
+    conn = open_worker_connection()
+    # Manage the transaction explicitly: the copy runs in one read transaction
+    conn.isolation_level = None
+    try:
+        cursor = conn.cursor()
+        # With WAL journaling, a read transaction held across all backup steps
+        # sees one snapshot while other connections keep writing, so the copy
+        # never restarts; the counter read in it matches the copied data
+        cursor.execute("BEGIN")
+        change_counter = load_state(cursor, "change_counter")
+        if not force and snapshots and snapshots[0]['change_counter'] == change_counter:
+            cursor.execute("COMMIT")
+            if DEBUG_ENABLED:
+                print("[DEBUG] Database unchanged since the last backup, skipping backup")
+            return None
+
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        started = time.perf_counter()
+        target = sqlite3.connect(COPY_FILE)
+        try:
+            conn.backup(target, pages=BACKUP_STEP_PAGES)
+            # Make the copy a single self-contained file
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+            cursor.execute("COMMIT")
+    finally:
+        conn.close()
+
+    try:
+        backup_file = store_snapshot(COPY_FILE, snapshots, change_counter)
+    finally:
+        os.remove(COPY_FILE)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if backup_file is not None:
+        print(f"Database backup created: {backup_file} ({elapsed_ms:.0f} ms)")
+    elif DEBUG_ENABLED:
+        print(f"[DEBUG] Database identical to a stored snapshot, nothing stored ({elapsed_ms:.0f} ms)")
+
+    prune_backups(snapshots, retention)
+    return backup_file
+
+def file_digest(path: str) -> str:
+    """Compute the SHA-256 hex digest of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def store_snapshot(copy_file: str, snapshots: List[Dict[str, Any]],
+                   change_counter: Optional[int]) -> Optional[str]:
+    """
+    Add a database copy to the backup store.
+
+    The copy is only compressed and stored if no stored snapshot has the
+    same content. If one does, that snapshot is recorded with the current
+    change counter, so the next backup can be skipped.
+
+    Args:
+        copy_file: Uncompressed database copy
+        snapshots: Stored snapshots as returned by load_manifest; updated in place
+        change_counter: Change counter of the copied database
+
+    Returns:
+        Path of the new snapshot, or None if an identical one is stored
+    """
+    sha256 = file_digest(copy_file)
+    for index, snapshot in enumerate(snapshots):
+        if snapshot['sha256'] == sha256:
+            snapshot['change_counter'] = change_counter
+            # Keep the newest snapshot first, so its counter is checked next time
+            snapshots.insert(0, snapshots.pop(index))
+            save_manifest(snapshots)
+            return None
+
+    created = time.time()
+    name = f"{BACKUP_PREFIX}{time.strftime('%Y%m%d%H%M%S', time.localtime(created))}{BACKUP_SUFFIX}"
+    backup_file = os.path.join(BACKUP_DIR, name)
+    with open(copy_file, 'rb') as source, \
+            gzip.open(COMPRESSED_FILE, 'wb', compresslevel=COMPRESS_LEVEL) as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    os.replace(COMPRESSED_FILE, backup_file)
+
+    # A second backup within the same second replaces the first
+    snapshots[:] = [snapshot for snapshot in snapshots if snapshot['file'] != name]
+    snapshots.insert(0, {
+        'file': name,
+        'created': created,
+        'sha256': sha256,
+        'size': os.path.getsize(copy_file),
+        'compressed_size': os.path.getsize(backup_file),
+        'change_counter': change_counter,
+    })
+    save_manifest(snapshots)
+    return backup_file
+
+def load_manifest() -> List[Dict[str, Any]]:
+    """
+    Load the list of stored snapshots.
+
+    Without a manifest, the uncompressed backups of older versions are
+    adopted once, so the retention policy takes care of them too.
+
+    Returns:
+        Snapshot records with the keys file, created, sha256, size,
+        compressed_size and change_counter, most recently stored first
+    """
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            return json.load(f)['snapshots']
+    except FileNotFoundError:
+        return adopt_legacy_backups()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # Snapshots missing from the list are never pruned, so nothing is lost
+        print(f"Error loading backup manifest: {e}")
+        return []
+
+def save_manifest(snapshots: List[Dict[str, Any]]) -> None:
+    """
+    Write the list of stored snapshots.
+
+    Args:
+        snapshots: Snapshot records, most recently stored first
+    """
+    with open(MANIFEST_FILE + TEMP_SUFFIX, 'w') as f:
+        json.dump({'version': 1, 'snapshots': snapshots}, f, indent=4)
+    os.replace(MANIFEST_FILE + TEMP_SUFFIX, MANIFEST_FILE)
+
+def adopt_legacy_backups() -> List[Dict[str, Any]]:
+    """
+    Record the uncompressed backups of older versions in a new manifest.
+
+    Returns:
+        Snapshot records of the legacy backups, newest first
+    """
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    snapshots = []
+    for name in os.listdir(BACKUP_DIR):
+        match = LEGACY_BACKUP.fullmatch(name)
+        if not match:
+            continue
+        path = os.path.join(BACKUP_DIR, name)
+        size = os.path.getsize(path)
+        snapshots.append({
+            'file': name,
+            'created': time.mktime(time.strptime(match.group(1), '%Y%m%d%H%M%S')),
+            'sha256': file_digest(path),
+            'size': size,
+            'compressed_size': size,
+            'change_counter': None,
+        })
+    snapshots.sort(key=lambda snapshot: snapshot['created'], reverse=True)
+    if snapshots:
+        save_manifest(snapshots)
+    return snapshots
+
+def select_retained(snapshots: List[Dict[str, Any]], retention: Dict[str, int]) -> Set[str]:
+    """
+    Choose the snapshots kept by the retention policy.
+
+    Keeps the newest retention['recent'] snapshots and, for each of hourly,
+    daily and weekly, the newest snapshot of each of the last N periods that
+    have one, where N is the policy's count for that tier.
+
+    Args:
+        snapshots: Snapshot records in any order
+        retention: Counts for every key of DEFAULT_RETENTION
+
+    Returns:
+        File names of the snapshots to keep
+    """
+    newest_first = sorted(snapshots, key=lambda snapshot: snapshot['created'], reverse=True)
+    keep = {snapshot['file'] for snapshot in newest_first[:max(retention['recent'], 0)]}
+    for tier, seconds in RETENTION_PERIODS.items():
+        periods: Set[int] = set()
+        for snapshot in newest_first:
+            if len(periods) >= retention[tier]:
+                break
+            # Shift to local time, so days start at local midnight
+            period = int((snapshot['created'] - time.timezone) // seconds)
+            if period not in periods:
+                periods.add(period)
+                keep.add(snapshot['file'])
+    return keep
+
+def prune_backups(snapshots: List[Dict[str, Any]],
+                  retention: Optional[Dict[str, int]] = None) -> None:
+    """
+    Delete the snapshots not kept by the retention policy.
+
+    Also removes temporary files left behind by interrupted backups.
+
+    Args:
+        snapshots: Stored snapshots; pruned ones are removed in place
+        retention: Retention counts overriding entries of DEFAULT_RETENTION
+    """
+    try:
+        policy = {tier: int(count) for tier, count in {**DEFAULT_RETENTION, **(retention or {})}.items()}
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid backup_retention: {retention}") from None
+    keep = select_retained(snapshots, policy)
+    pruned = [snapshot['file'] for snapshot in snapshots if snapshot['file'] not in keep]
+    if pruned:
+        # Update the manifest first, so it never lists a deleted snapshot
+        snapshots[:] = [snapshot for snapshot in snapshots if snapshot['file'] in keep]
+        save_manifest(snapshots)
+        for name in pruned:
+            try:
+                os.remove(os.path.join(BACKUP_DIR, name))
+            except FileNotFoundError:
+                pass
+            print(f"Deleted old backup: {name}")
+
+    for path in TEMP_FILES:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,41 +1,135 @@
 """
 Database module for DLSite Collection Helper.
 
-This module handles all database operations including setup, backup, and CRUD operations
+This module handles all database operations including setup, migrations, and CRUD operations
 for DLSite IDs and their associated metadata. It uses SQLite for data storage and
 provides functions for managing the database schema and content.
 
+The main thread shares one long-lived connection, returned by get_connection.
+Background workers open their own connection with open_worker_connection, since
+SQLite connections cannot be shared between threads. All connections use WAL
+journaling, so readers and the single writer do not block each other.
+
 Functions:
     setup_database: Initialize or update the database schema
-    backup_database: Create a backup of the current database
-    get_connection: Get a connection to the SQLite database
-    update_marked_status: Update the presence status of DLSite IDs
-    reset_all_marked_status: Reset all presence statuses to unmarked
+    run_migrations: Run all pending schema migrations
+    get_column_names: Get the column names of a table
+    migrate_*: Individual schema migrations, run in the order listed in MIGRATIONS
+    version_key_sql: Build the SQL expression packing a version into its version key
+    create_version_key_triggers: Create the triggers maintaining the version keys
+    deduplicate_ids: Remove duplicate (ID, version) rows before indexing
+    get_connection: Get the shared connection of the main thread
+    open_worker_connection: Open a separate connection for a background thread
+    close_connection: Close the shared connection
+    configure_connection: Apply the performance pragmas to a connection
+    transaction: Context manager running a block in one transaction
+    load_id_map: Load all DLSite IDs into an in-memory lookup table
+    presence_status: Classify an entry against the versions of its ID found on disk
+    apply_marked_status: Apply a complete set of presence statuses with one executemany
+    sync_marked_status: Recompute presence of specific rows from the scan snapshot
+    load_scan_dirs: Load the directories recorded in the scan snapshot
+    load_scan_files: Load the files recorded for one directory in the scan snapshot
+    load_scan_signature: Load the scan configuration the snapshot was taken with
+    save_scan_snapshot: Persist the differences found by a rescan
+    load_present_keys: Load every (prefix, number, version key) ID key seen in the scan snapshot
+    load_state: Load an integer value from the database state table
+    save_state: Save an integer value to the database state table
     add_or_update_id: Add or update a DLSite ID in the database
 """
 
-import os
-import shutil
 import sqlite3
 import time
+from contextlib import contextmanager
 from config import DEBUG_ENABLED
-from typing import Optional
+from search_index import create_fts_index, has_fts_index
+from file_utils import ID_LETTERS, VERSION_PART_BITS
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 # Constants
-BACKUP_DIR = "db-backup"
 DB_FILE = "dlsite_ids.db"
 
+# Connection tuning
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 32 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Key matching files to IDs: (prefix, ID number, packed version key or None)
+IdKey = Tuple[str, int, Optional[int]]
+
+# Presence statuses stored in dlsite_ids.marked. A copy with a different
+# version than the entry is outdated or newer; the exact version wins over
+# a newer copy, which wins over an outdated one. Missing versions count as
+# older than any version.
+STATUS_MISSING = 0
+STATUS_PRESENT = 1
+STATUS_OUTDATED = 2
+STATUS_NEWER = 3
+
+# SQL expression computing the presence status of a dlsite_ids row from the scan snapshot
+STATUS_SQL = f"""
+    CASE
+        WHEN EXISTS (
+            SELECT 1 FROM scan_files
+            WHERE scan_files.prefix = dlsite_ids.prefix
+            AND scan_files.id_number = dlsite_ids.id_number
+            AND scan_files.version_key IS dlsite_ids.version_key
+        ) THEN {STATUS_PRESENT}
+        WHEN EXISTS (
+            SELECT 1 FROM scan_files
+            WHERE scan_files.prefix = dlsite_ids.prefix
+            AND scan_files.id_number = dlsite_ids.id_number
+            AND COALESCE(scan_files.version_key, -1) > COALESCE(dlsite_ids.version_key, -1)
+        ) THEN {STATUS_NEWER}
+        WHEN EXISTS (
+            SELECT 1 FROM scan_files
+            WHERE scan_files.prefix = dlsite_ids.prefix
+            AND scan_files.id_number = dlsite_ids.id_number
+        ) THEN {STATUS_OUTDATED}
+        ELSE {STATUS_MISSING}
+    END
+"""
+
+# Shared connection of the main thread, opened on first use
+_connection: Optional[sqlite3.Connection] = None
+
 def setup_database() -> None:
     """
     Initialize or update the database schema.
     
-    Creates the necessary tables if they don't exist and performs any required
-    schema migrations for version updates.
+    Brings the database up to the latest schema version by running any
+    pending migrations, and creates the FTS5 search index if it is missing.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = get_connection()
+    run_migrations(conn)
+    # The SQLite library may have gained FTS5 trigram support since migration 5 ran
+    if not has_fts_index(conn.cursor()):
+        with transaction(conn, immediate=True) as cursor:
+            create_fts_index(cursor)
 
-    # Create the table if it doesn't exist
+def get_column_names(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    """
+    Get the column names of a table.
+    
+    Args:
+        cursor: SQLite cursor object
+        table: Name of the table
+        
+    Returns:
+        List of column names, empty if the table doesn't exist
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [column[1] for column in cursor.fetchall()]
+
+# Schema migrations
+#
+# Each migration runs in its own transaction together with the user_version
+# bump, so a failed migration leaves the database at the previous version.
+# Migrations up to 4 predate user_version tracking and may find their changes
+# already applied, so they check before changing anything. New migrations are
+# appended with the next number and can assume all earlier ones have run.
+
+def migrate_create_ids_table(cursor: sqlite3.Cursor) -> None:
+    """Create the dlsite_ids table."""
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS dlsite_ids (
             dlsite_id TEXT NOT NULL,
@@ -44,90 +138,681 @@ def setup_database() -> None:
             marked INTEGER DEFAULT 0
         )
     """)
-    
-    # Check if marked column exists, add it if it doesn't
-    cursor.execute("PRAGMA table_info(dlsite_ids)")
-    columns = [column[1] for column in cursor.fetchall()]
-    if "marked" not in columns:
+
+def migrate_add_marked_column(cursor: sqlite3.Cursor) -> None:
+    """Add the presence status column to databases created before it existed."""
+    if "marked" not in get_column_names(cursor, "dlsite_ids"):
         cursor.execute("ALTER TABLE dlsite_ids ADD COLUMN marked INTEGER DEFAULT 0")
 
-    conn.commit()
-    conn.close()
+def migrate_add_scan_snapshot(cursor: sqlite3.Cursor) -> None:
+    """Create the persisted folder scan snapshot used for incremental rescans."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scan_dirs (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            parent TEXT
+        )
+    """)
+    if "parent" not in get_column_names(cursor, "scan_dirs"):
+        cursor.execute("ALTER TABLE scan_dirs ADD COLUMN parent TEXT")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scan_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scan_files (
+            dir TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            dlsite_id TEXT,
+            version TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (dir, name)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scan_files_id_version
+        ON scan_files (dlsite_id, version)
+    """)
+
+def migrate_add_id_indexes(cursor: sqlite3.Cursor) -> None:
+    """Add lookup indexes, removing duplicate (ID, version) rows first."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_dlsite_ids_id_version'"
+    )
+    if cursor.fetchone() is None:
+        deduplicate_ids(cursor)
+        cursor.execute("""
+            CREATE UNIQUE INDEX idx_dlsite_ids_id_version
+            ON dlsite_ids (dlsite_id, version)
+        """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dlsite_ids_marked ON dlsite_ids (marked)")
+
+def migrate_add_search_index(cursor: sqlite3.Cursor) -> None:
+    """Add the FTS5 trigram index for substring search, if SQLite supports it."""
+    create_fts_index(cursor)
 
-def backup_database() -> None:
+# SQL expressions for the uppercase letter prefix of an ID column, like 'VJ'
+# for 'VJ012345', and the integer number after it (NULL without digits).
+# Bare numbers are treated as RJ IDs; both match file_utils.split_dlsite_id.
+PREFIX_SQL = (
+    "COALESCE(NULLIF(upper(substr({column}, 1, "
+    f"length({{column}}) - length(ltrim({{column}}, '{ID_LETTERS}')))), ''), 'RJ')"
+)
+NUMBER_SQL = (
+    f"CASE WHEN ltrim({{column}}, '{ID_LETTERS}') GLOB '[0-9]*' "
+    f"THEN CAST(ltrim({{column}}, '{ID_LETTERS}') AS INTEGER) END"
+)
+
+DIGITS = "0123456789"
+
+def version_key_sql(column: str) -> str:
     """
-    Create a backup of the current database.
+    Build an SQL expression packing a version column like file_utils.pack_version.
+    
+    Plain SQL, so the triggers using it work on connections that did not
+    register any functions, like the sqlite3 shell. Without regular
+    expressions, each number is found by trimming the characters that are
+    not digits from the start; the text with all digits removed is the set
+    of those characters.
     
-    Creates a timestamped copy of the database file in the backups folder.
-    Only keeps the 3 most recent backups.
+    Args:
+        column: SQL expression of the version text, e.g. 'new.version'
+        
+    Returns:
+        SQL expression of the version key, NULL if the text has no digit
     """
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
+    non_digits = column
+    for digit in DIGITS:
+        non_digits = f"replace({non_digits}, '{digit}', '')"
+    key = "0"
+    rest = column
+    for bits in VERSION_PART_BITS:
+        # Starts at the next number; CAST reads its leading digits, '' is 0
+        part = f"ltrim({rest}, {non_digits})"
+        key = f"(({key}) << {bits}) | min(CAST({part} AS INTEGER), {(1 << bits) - 1})"
+        rest = f"ltrim({part}, '{DIGITS}')"
+    return f"CASE WHEN {column} GLOB '*[0-9]*' THEN {key} END"
+
+def migrate_add_prefix_column(cursor: sqlite3.Cursor) -> None:
+    """Add the indexed product prefix column, maintained by triggers."""
+    cursor.execute("ALTER TABLE dlsite_ids ADD COLUMN prefix TEXT NOT NULL DEFAULT ''")
+    cursor.execute(f"UPDATE dlsite_ids SET prefix = {PREFIX_SQL.format(column='dlsite_id')}")
+    # Triggers keep the prefix in sync with every way an ID is written
+    new_prefix = PREFIX_SQL.format(column='new.dlsite_id')
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_prefix_insert AFTER INSERT ON dlsite_ids BEGIN
+            UPDATE dlsite_ids SET prefix = {new_prefix} WHERE rowid = new.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_prefix_update AFTER UPDATE OF dlsite_id ON dlsite_ids BEGIN
+            UPDATE dlsite_ids SET prefix = {new_prefix} WHERE rowid = new.rowid;
+        END
+    """)
+    cursor.execute("CREATE INDEX idx_dlsite_ids_prefix ON dlsite_ids (prefix, dlsite_id)")
+
+def migrate_add_id_numbers(cursor: sqlite3.Cursor) -> None:
+    """Store IDs as (prefix, integer number) in the IDs table and the scan snapshot."""
+    cursor.execute("ALTER TABLE dlsite_ids ADD COLUMN id_number INTEGER")
+    cursor.execute(f"UPDATE dlsite_ids SET id_number = {NUMBER_SQL.format(column='dlsite_id')}")
+    # Replace the prefix triggers with ones maintaining both columns
+    cursor.execute("DROP TRIGGER dlsite_ids_prefix_insert")
+    cursor.execute("DROP TRIGGER dlsite_ids_prefix_update")
+    new_prefix = PREFIX_SQL.format(column='new.dlsite_id')
+    new_number = NUMBER_SQL.format(column='new.dlsite_id')
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_number_insert AFTER INSERT ON dlsite_ids BEGIN
+            UPDATE dlsite_ids SET prefix = {new_prefix}, id_number = {new_number}
+            WHERE rowid = new.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_number_update AFTER UPDATE OF dlsite_id ON dlsite_ids BEGIN
+            UPDATE dlsite_ids SET prefix = {new_prefix}, id_number = {new_number}
+            WHERE rowid = new.rowid;
+        END
+    """)
+    cursor.execute("DROP INDEX idx_dlsite_ids_prefix")
+    cursor.execute("CREATE INDEX idx_dlsite_ids_number ON dlsite_ids (prefix, id_number, version)")
+
+    # The scanner writes both columns for new files
+    cursor.execute("ALTER TABLE scan_files ADD COLUMN prefix TEXT")
+    cursor.execute("ALTER TABLE scan_files ADD COLUMN id_number INTEGER")
+    cursor.execute(f"""
+        UPDATE scan_files SET prefix = {PREFIX_SQL.format(column='dlsite_id')},
+                              id_number = {NUMBER_SQL.format(column='dlsite_id')}
+        WHERE dlsite_id IS NOT NULL
+    """)
+    cursor.execute("DROP INDEX idx_scan_files_id_version")
+    cursor.execute("CREATE INDEX idx_scan_files_number ON scan_files (prefix, id_number, version)")
+
+def create_version_key_triggers(cursor: sqlite3.Cursor) -> None:
+    """Create the triggers keeping dlsite_ids.version_key in sync with the version."""
+    new_key = version_key_sql('new.version')
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_version_insert AFTER INSERT ON dlsite_ids BEGIN
+            UPDATE dlsite_ids SET version_key = {new_key} WHERE rowid = new.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_version_update AFTER UPDATE OF version ON dlsite_ids BEGIN
+            UPDATE dlsite_ids SET version_key = {new_key} WHERE rowid = new.rowid;
+        END
+    """)
+
+def migrate_add_version_keys(cursor: sqlite3.Cursor) -> None:
+    """Store versions as packed integer keys for sorting, searching and scan matching."""
+    cursor.execute("ALTER TABLE dlsite_ids ADD COLUMN version_key INTEGER")
+    cursor.execute(f"UPDATE dlsite_ids SET version_key = {version_key_sql('version')}")
+    create_version_key_triggers(cursor)
+    cursor.execute("DROP INDEX idx_dlsite_ids_number")
+    cursor.execute("CREATE INDEX idx_dlsite_ids_number ON dlsite_ids (prefix, id_number, version_key)")
+    cursor.execute("CREATE INDEX idx_dlsite_ids_version_key ON dlsite_ids (version_key)")
+
+    # The scanner writes the key for new files
+    cursor.execute("ALTER TABLE scan_files ADD COLUMN version_key INTEGER")
+    cursor.execute(f"UPDATE scan_files SET version_key = {version_key_sql('version')}")
+    cursor.execute("DROP INDEX idx_scan_files_number")
+    cursor.execute("CREATE INDEX idx_scan_files_number ON scan_files (prefix, id_number, version_key)")
 
-    timestamp = time.strftime("%Y%m%d%H%M%S")
-    backup_file = os.path.join(BACKUP_DIR, f"dlsite_ids_backup_{timestamp}.db")
+def migrate_classify_presence(cursor: sqlite3.Cursor) -> None:
+    """Classify copies with another version than their entry as outdated or newer."""
+    cursor.execute(f"UPDATE dlsite_ids SET marked = {STATUS_SQL} WHERE marked != {STATUS_PRESENT}")
 
-    # Only create backup if database file exists
-    if os.path.exists(DB_FILE):
-        shutil.copy(DB_FILE, backup_file)
-        print(f"Startup backup created: {backup_file}")
+def migrate_add_change_counter(cursor: sqlite3.Cursor) -> None:
+    """Count changes to the entries, so unchanged databases are not backed up again."""
+    cursor.execute("""
+        CREATE TABLE db_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT INTO db_state (key, value) VALUES ('change_counter', 0)")
+    # Presence statuses are derived from the folders, so only user data counts
+    for name, event in (("insert", "INSERT"), ("delete", "DELETE"),
+                        ("update", "UPDATE OF dlsite_id, tested, version")):
+        cursor.execute(f"""
+            CREATE TRIGGER dlsite_ids_count_{name} AFTER {event} ON dlsite_ids BEGIN
+                UPDATE db_state SET value = value + 1 WHERE key = 'change_counter';
+            END
+        """)
+
+def migrate_add_change_journal(cursor: sqlite3.Cursor) -> None:
+    """Record every change to the entries, so edits can be undone and the entries restored."""
+    cursor.execute("""
+        CREATE TABLE journal_batches (
+            batch INTEGER PRIMARY KEY,
+            label TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            reverts INTEGER,
+            undone_by INTEGER
+        )
+    """)
+    # Old values are NULL for inserts, new values NULL for deletes
+    cursor.execute("""
+        CREATE TABLE change_journal (
+            seq INTEGER PRIMARY KEY,
+            changed_at REAL NOT NULL,
+            batch INTEGER,
+            row_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            old_dlsite_id TEXT,
+            old_tested TEXT,
+            old_version TEXT,
+            new_dlsite_id TEXT,
+            new_tested TEXT,
+            new_version TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_change_journal_time ON change_journal (changed_at)")
+    cursor.execute("CREATE INDEX idx_change_journal_batch ON change_journal (batch)")
+    # Unix time with fractions of a second, and the batch set by journal.journal_batch
+    changed_at = "(julianday('now') - 2440587.5) * 86400.0"
+    batch = "NULLIF((SELECT value FROM db_state WHERE key = 'journal_batch'), 0)"
+    old_values = "old.dlsite_id, old.tested, old.version"
+    new_values = "new.dlsite_id, new.tested, new.version"
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_journal_insert AFTER INSERT ON dlsite_ids BEGIN
+            INSERT INTO change_journal (changed_at, batch, row_id, action,
+                                        new_dlsite_id, new_tested, new_version)
+            VALUES ({changed_at}, {batch}, new.rowid, 'insert', {new_values});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_journal_delete AFTER DELETE ON dlsite_ids BEGIN
+            INSERT INTO change_journal (changed_at, batch, row_id, action,
+                                        old_dlsite_id, old_tested, old_version)
+            VALUES ({changed_at}, {batch}, old.rowid, 'delete', {old_values});
+        END
+    """)
+    # Presence statuses are derived from the folders and not journaled
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_journal_update AFTER UPDATE OF dlsite_id, tested, version ON dlsite_ids
+        WHEN old.dlsite_id IS NOT new.dlsite_id OR old.tested IS NOT new.tested
+            OR old.version IS NOT new.version
+        BEGIN
+            INSERT INTO change_journal (changed_at, batch, row_id, action,
+                                        old_dlsite_id, old_tested, old_version,
+                                        new_dlsite_id, new_tested, new_version)
+            VALUES ({changed_at}, {batch}, new.rowid, 'update', {old_values}, {new_values});
+        END
+    """)
+
+# Ordered list of (schema version, description, migration function)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "Create dlsite_ids table", migrate_create_ids_table),
+    (2, "Add marked column", migrate_add_marked_column),
+    (3, "Add scan snapshot tables", migrate_add_scan_snapshot),
+    (4, "Add dlsite_ids indexes", migrate_add_id_indexes),
+    (5, "Add substring search index", migrate_add_search_index),
+    (6, "Add product prefix column", migrate_add_prefix_column),
+    (7, "Add integer ID numbers", migrate_add_id_numbers),
+    (8, "Add packed version keys", migrate_add_version_keys),
+    (9, "Classify outdated and newer copies", migrate_classify_presence),
+    (10, "Add change counter", migrate_add_change_counter),
+    (11, "Add change journal", migrate_add_change_journal),
+]
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Run all pending schema migrations.
+    
+    The schema version is stored in PRAGMA user_version. Each pending
+    migration runs in its own transaction, is timed, and bumps the version
+    when it commits, so a database that is already up to date costs a single
+    PRAGMA read on startup.
+    
+    Args:
+        conn: SQLite connection object
+        
+    Returns:
+        The schema version after migrating
+    """
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    latest_version = MIGRATIONS[-1][0]
+    if current_version > latest_version:
+        print(f"Database schema version {current_version} is newer than this application "
+              f"supports ({latest_version})")
+        return current_version
+    
+    # Manage transactions explicitly so schema changes are transactional too
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        for version, description, migrate in MIGRATIONS:
+            if version <= current_version:
+                continue
+            started = time.perf_counter()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                migrate(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"Applied database migration {version} ({description}) in {elapsed_ms:.1f} ms")
+            current_version = version
+    finally:
+        conn.isolation_level = isolation_level
+    return current_version
 
-        # Get list of existing backups and sort by timestamp (newest first)
-        backup_files = []
-        for f in os.listdir(BACKUP_DIR):
-            if f.startswith("dlsite_ids_backup_") and f.endswith(".db"):
-                backup_path = os.path.join(BACKUP_DIR, f)
-                backup_files.append((os.path.getmtime(backup_path), f))
+def deduplicate_ids(cursor: sqlite3.Cursor) -> int:
+    """
+    Remove duplicate (DLSite ID, version) rows so they can be uniquely indexed.
+    
+    Missing versions are stored as empty strings first, since SQLite treats
+    every NULL as distinct in a unique index. Of each group of duplicates the
+    row marked as tested is kept, falling back to the oldest row, and it
+    inherits the presence status of the group.
+    
+    Args:
+        cursor: SQLite cursor object
         
-        backup_files.sort(reverse=True)  # Sort by modification time, newest first
+    Returns:
+        Number of duplicate rows removed
+    """
+    cursor.execute("UPDATE dlsite_ids SET version = '' WHERE version IS NULL")
+    cursor.execute("""
+        CREATE TEMP TABLE dedupe_keep AS
+        SELECT rowid AS keep_rowid, group_marked FROM (
+            SELECT rowid,
+                   MAX(marked) OVER (PARTITION BY dlsite_id, version) AS group_marked,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY dlsite_id, version
+                       ORDER BY tested = 'Yes' DESC, rowid
+                   ) AS position
+            FROM dlsite_ids
+        )
+        WHERE position = 1
+    """)
+    cursor.execute("""
+        DELETE FROM dlsite_ids
+        WHERE rowid NOT IN (SELECT keep_rowid FROM dedupe_keep)
+    """)
+    removed = cursor.rowcount
+    cursor.execute("""
+        UPDATE dlsite_ids
+        SET marked = (SELECT group_marked FROM dedupe_keep WHERE keep_rowid = dlsite_ids.rowid)
+    """)
+    cursor.execute("DROP TABLE dedupe_keep")
+    if removed:
+        print(f"Removed {removed} duplicate database entries")
+    return removed
 
-        # Keep only the 3 newest backups
-        for _, fname in backup_files[3:]:  # Skip first 3, delete the rest
-            os.remove(os.path.join(BACKUP_DIR, fname))
-            print(f"Deleted old backup: {fname}")
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """
+    Apply the performance pragmas to a connection.
+    
+    WAL journaling with synchronous=NORMAL only syncs on checkpoints instead
+    of on every commit, which stays safe against corruption but may lose the
+    last transactions on power loss. The page cache and memory map are sized
+    so that a large library is read from memory after the first scan.
+    
+    Args:
+        conn: SQLite connection object
+        
+    Returns:
+        The same connection, for chaining
+    """
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
 
 def get_connection() -> sqlite3.Connection:
     """
-    Get a connection to the SQLite database.
+    Get the shared connection of the main thread.
+    
+    The connection is opened and configured on first use and stays open until
+    close_connection is called, so callers must not close it.
+    
+    Returns:
+        sqlite3.Connection object for database operations
+    """
+    global _connection
+    if _connection is None:
+        _connection = configure_connection(sqlite3.connect(DB_FILE))
+    return _connection
+
+def open_worker_connection() -> sqlite3.Connection:
+    """
+    Open a separate connection for a background thread.
+    
+    The caller owns the connection and must close it when done.
     
     Returns:
         sqlite3.Connection object for database operations
     """
-    return sqlite3.connect(DB_FILE)
+    return configure_connection(sqlite3.connect(DB_FILE))
+
+def close_connection() -> None:
+    """
+    Close the shared connection.
+    
+    Checkpoints the write-ahead log first so the database file is complete
+    on its own.
+    """
+    global _connection
+    if _connection is not None:
+        _connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        _connection.close()
+        _connection = None
+
+@contextmanager
+def transaction(conn: Optional[sqlite3.Connection] = None,
+                immediate: bool = False) -> Iterator[sqlite3.Cursor]:
+    """
+    Context manager running a block in one transaction.
+    
+    Commits when the block completes and rolls back if it raises.
+    
+    Args:
+        conn: Connection to use, defaults to the shared connection
+        immediate: Take the write lock up front, so rows read in the block
+            cannot change before the block writes
+        
+    Yields:
+        sqlite3.Cursor for the transaction
+    """
+    conn = conn if conn is not None else get_connection()
+    with conn:
+        cursor = conn.cursor()
+        if immediate:
+            cursor.execute("BEGIN IMMEDIATE")
+        yield cursor
+
+def load_id_map(cursor: sqlite3.Cursor) -> Tuple[Dict[Tuple[str, int], List[Tuple[int, Optional[int]]]],
+                                                Dict[int, int]]:
+    """
+    Load every DLSite ID into an in-memory lookup table.
+    
+    IDs are keyed by their prefix and integer number, and every entry of an
+    ID carries its packed version key, which is None for missing versions.
+    IDs without a number never match a file and are left out.
+    
+    Args:
+        cursor: SQLite cursor object
+        
+    Returns:
+        Tuple of ((prefix, number) -> list of (row ID, version key),
+        row ID -> presence status for rows that are not missing)
+    """
+    id_map: Dict[Tuple[str, int], List[Tuple[int, Optional[int]]]] = {}
+    current_statuses: Dict[int, int] = {}
+    cursor.execute("SELECT rowid, prefix, id_number, version_key, marked FROM dlsite_ids")
+    for rowid, prefix, id_number, version_key, marked in cursor.fetchall():
+        if id_number is not None:
+            id_map.setdefault((prefix, id_number), []).append((rowid, version_key))
+        if marked:
+            current_statuses[rowid] = marked
+    return id_map, current_statuses
 
-def update_marked_status(cursor: sqlite3.Cursor, rowid: int, marked: bool) -> None:
+def presence_status(version_key: Optional[int], disk_keys: Set[Optional[int]]) -> int:
     """
-    Update the presence status of a DLSite ID.
+    Classify an entry against the versions of its ID found on disk.
+    
+    Matches STATUS_SQL, which does the same for single rows in SQL.
+    
+    Args:
+        version_key: Packed version key of the entry, None without a version
+        disk_keys: Packed version keys of all copies of the ID on disk
+        
+    Returns:
+        STATUS_PRESENT, STATUS_NEWER, STATUS_OUTDATED or STATUS_MISSING
+    """
+    if not disk_keys:
+        return STATUS_MISSING
+    if version_key in disk_keys:
+        return STATUS_PRESENT
+    entry_key = -1 if version_key is None else version_key
+    if any((-1 if key is None else key) > entry_key for key in disk_keys):
+        return STATUS_NEWER
+    return STATUS_OUTDATED
+
+def apply_marked_status(cursor: sqlite3.Cursor, statuses: Dict[int, int],
+                        current_statuses: Dict[int, int]) -> Set[int]:
+    """
+    Apply a complete set of presence statuses with one executemany.
+    
+    Only rows whose status actually changes are written. Run it in the
+    transaction that loaded current_statuses, so no edit lands in between.
     
     Args:
         cursor: SQLite cursor object
-        rowid: Row ID of the DLSite ID to update
-        marked: Whether the ID is present (True) or absent (False)
+        statuses: Row ID -> presence status for rows found on disk; all
+            other rows become missing
+        current_statuses: Row ID -> presence status of rows that are not missing right now
+        
+    Returns:
+        Set of row IDs whose status changed
     """
+    changes = [(status, rowid) for rowid, status in statuses.items()
+               if status != current_statuses.get(rowid, STATUS_MISSING)]
+    changes.extend((STATUS_MISSING, rowid) for rowid in current_statuses if rowid not in statuses)
+    
     if DEBUG_ENABLED:
-        print(f"[DEBUG] Updating marked status - rowid: {rowid}, marked: {marked}")
+        counts = {status: 0 for status in (STATUS_PRESENT, STATUS_NEWER, STATUS_OUTDATED)}
+        for status in statuses.values():
+            counts[status] += 1
+        print(f"[DEBUG] Applying presence status - {len(changes)} changed; "
+              f"{counts[STATUS_PRESENT]} present, {counts[STATUS_OUTDATED]} outdated, "
+              f"{counts[STATUS_NEWER]} newer")
+    
+    cursor.executemany("UPDATE dlsite_ids SET marked = ? WHERE rowid = ?", changes)
+    return {rowid for _, rowid in changes}
+
+def sync_marked_status(cursor: sqlite3.Cursor, rowids: Iterable[int]) -> None:
+    """
+    Recompute the presence status of specific rows from the scan snapshot.
+    
+    Used after a row is added or edited so its marker is correct without
+    rescanning the folder.
+    
+    Args:
+        cursor: SQLite cursor object
+        rowids: Row IDs of the DLSite IDs to update
+    """
+    cursor.executemany(f"UPDATE dlsite_ids SET marked = {STATUS_SQL} WHERE rowid = ?",
+                       ((rowid,) for rowid in rowids))
+
+def load_scan_dirs(cursor: sqlite3.Cursor) -> Dict[str, Tuple[int, Optional[str]]]:
+    """
+    Load the directories recorded in the scan snapshot.
+    
+    Args:
+        cursor: SQLite cursor object
+        
+    Returns:
+        Dictionary of directory path -> (mtime at last scan, parent directory path)
+    """
+    cursor.execute("SELECT path, mtime_ns, parent FROM scan_dirs")
+    return {path: (mtime_ns, parent) for path, mtime_ns, parent in cursor.fetchall()}
+
+def load_scan_files(cursor: sqlite3.Cursor, dir_path: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Load the files recorded for one directory in the scan snapshot.
+    
+    Args:
+        cursor: SQLite cursor object
+        dir_path: Directory the snapshot was taken of
+        
+    Returns:
+        Dictionary of file name -> (size, mtime)
+    """
+    cursor.execute("SELECT name, size, mtime_ns FROM scan_files WHERE dir = ?", (dir_path,))
+    return {name: (size, mtime_ns) for name, size, mtime_ns in cursor.fetchall()}
+
+def load_scan_signature(cursor: sqlite3.Cursor) -> Optional[str]:
+    """
+    Load the scan configuration the snapshot was taken with.
+    
+    Args:
+        cursor: SQLite cursor object
+        
+    Returns:
+        Serialized scan configuration, or None if nothing was scanned yet
+    """
+    cursor.execute("SELECT value FROM scan_state WHERE key = 'signature'")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def save_scan_snapshot(conn: sqlite3.Connection, signature: str,
+                       dirs: List[Tuple[str, int, Optional[str]]],
+                       upserts: List[Tuple[str, str, int, int, Optional[str], Optional[str],
+                                          Optional[int], str, Optional[int]]],
+                       removed_files: List[Tuple[str, str]],
+                       removed_dirs: List[str]) -> None:
+    """
+    Persist the differences found by a rescan in one transaction.
+    
+    When the scan configuration changed, the previous snapshot is discarded
+    first since it no longer describes the configured roots.
+    
+    Args:
+        conn: SQLite connection object
+        signature: Serialized scan configuration the snapshot was taken with
+        dirs: (path, mtime, parent) of directories that were listed
+        upserts: (directory, name, size, mtime, DLSite ID, prefix, number, version,
+            version key) of new files
+        removed_files: (directory, name) of files that disappeared
+        removed_dirs: Paths of directories that disappeared or are no longer scanned
+    """
+    with transaction(conn) as cursor:
+        if load_scan_signature(cursor) != signature:
+            cursor.execute("DELETE FROM scan_files")
+            cursor.execute("DELETE FROM scan_dirs")
+        cursor.executemany("DELETE FROM scan_files WHERE dir = ?",
+                           ((path,) for path in removed_dirs))
+        cursor.executemany("DELETE FROM scan_dirs WHERE path = ?",
+                           ((path,) for path in removed_dirs))
+        cursor.executemany("DELETE FROM scan_files WHERE dir = ? AND name = ?", removed_files)
+        cursor.executemany("""
+            INSERT OR REPLACE INTO scan_files
+                (dir, name, size, mtime_ns, dlsite_id, prefix, id_number, version, version_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, upserts)
+        cursor.executemany("INSERT OR REPLACE INTO scan_dirs (path, mtime_ns, parent) VALUES (?, ?, ?)",
+                           dirs)
+        cursor.execute("INSERT OR REPLACE INTO scan_state (key, value) VALUES ('signature', ?)",
+                       (signature,))
+
+def load_present_keys(cursor: sqlite3.Cursor) -> Set[IdKey]:
+    """
+    Load every (prefix, number, version key) ID key seen in the scan snapshot.
+    
+    Args:
+        cursor: SQLite cursor object
+        
+    Returns:
+        Set of (prefix, number, version key) keys present on disk, as used by load_id_map
+    """
     cursor.execute(
-        "UPDATE dlsite_ids SET marked = ? WHERE rowid = ?",
-        (1 if marked else 0, rowid)
+        "SELECT DISTINCT prefix, id_number, version_key FROM scan_files WHERE id_number IS NOT NULL"
     )
-    cursor.connection.commit()  # Commit the change immediately
+    return set(cursor.fetchall())
 
-def reset_all_marked_status(cursor: sqlite3.Cursor) -> None:
+def load_state(cursor: sqlite3.Cursor, key: str) -> Optional[int]:
     """
-    Reset all presence statuses to unmarked (absent).
+    Load an integer value from the database state table.
     
     Args:
         cursor: SQLite cursor object
+        key: Name of the value, e.g. 'change_counter'
+        
+    Returns:
+        The stored value, or None if it was never saved
     """
-    if DEBUG_ENABLED:
-        print("[DEBUG] Resetting all marked statuses to 0")
-    cursor.execute("UPDATE dlsite_ids SET marked = 0")
-    cursor.connection.commit()  # Commit the change immediately
+    cursor.execute("SELECT value FROM db_state WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def save_state(cursor: sqlite3.Cursor, key: str, value: int) -> None:
+    """
+    Save an integer value to the database state table.
+    
+    Args:
+        cursor: SQLite cursor object
+        key: Name of the value
+        value: Value to store
+    """
+    cursor.execute("INSERT OR REPLACE INTO db_state (key, value) VALUES (?, ?)", (key, value))
 
 def add_or_update_id(dlsite_id: str, version: Optional[str] = "", tested: str = "No") -> None:
     """
     Add or update a DLSite ID in the database.
     
+    If the ID already exists, the row with the same version is updated, or
+    otherwise one existing row of that ID is moved to the new version.
+    
     Args:
         dlsite_id: The DLSite ID to add or update
         version: The version of the DLSite ID (optional)
@@ -136,24 +821,20 @@ def add_or_update_id(dlsite_id: str, version: Optional[str] = "", tested: str =
     dlsite_id = dlsite_id.strip().upper()
     version = version.strip() if version else ""
     
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # Check if ID exists
-    cursor.execute("SELECT * FROM dlsite_ids WHERE dlsite_id = ?", (dlsite_id,))
-    existing = cursor.fetchone()
-    
-    if existing:
+    with transaction() as cursor:
+        # Both statements are index lookups on (dlsite_id, version)
         cursor.execute("""
-            UPDATE dlsite_ids 
+            UPDATE dlsite_ids
             SET version = ?, tested = ?
-            WHERE dlsite_id = ?
-        """, (version, tested, dlsite_id))
-    else:
-        cursor.execute("""
-            INSERT INTO dlsite_ids (dlsite_id, version, tested)
-            VALUES (?, ?, ?)
-        """, (dlsite_id, version, tested))
-    
-    conn.commit()
-    conn.close()
+            WHERE rowid = (
+                SELECT rowid FROM dlsite_ids
+                WHERE dlsite_id = ?
+                ORDER BY version = ? DESC
+                LIMIT 1
+            )
+        """, (version, tested, dlsite_id, version))
+        if cursor.rowcount == 0:
+            cursor.execute("""
+                INSERT INTO dlsite_ids (dlsite_id, version, tested)
+                VALUES (?, ?, ?)
+            """, (dlsite_id, version, tested))
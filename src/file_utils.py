@@ -5,19 +5,33 @@ This module provides utility functions for file operations, version handling,
 and configuration management. It includes functions for parsing DLSite IDs,
 managing version information, and handling application configuration.
 
+Classes:
+    ParsedName: Immutable (DLSite ID, version) result of parsing a filename
+
 Functions:
     format_version: Format version string for display
     strip_version_prefix: Remove version prefix from string
-    extract_id_and_version: Parse ID and version from filename
+    version_sort_key: Build a numeric sort key from a version string
+    pack_version: Pack a version into an order-preserving integer key
+    compile_id_pattern: Compile the pattern finding DLSite IDs in filenames
+    set_dlsite_prefixes: Configure the product prefixes recognized in filenames
+    get_dlsite_prefixes: Get the product prefixes recognized in filenames
+    split_dlsite_id: Split a DLSite ID into its prefix and integer number
+    parse_filename: Parse ID and version from a filename with precompiled patterns
+    extract_id_and_version: Parse ID and version from filename, with debug logging
+    parse_many: Parse a batch of filenames through the parse cache
+    parse_cache_stats: Get the hit and miss counts of the parse cache
     load_config: Load application configuration from file
     save_config: Save application configuration to file
+    get_scan_roots: Build the list of folders to scan from configuration
 """
 
 import os
 import re
 import json
+import functools
 from config import DEBUG_ENABLED
-from typing import Tuple, Dict, Optional, Union
+from typing import Any, Tuple, Dict, List, NamedTuple, Optional, Sequence, Union
 
 CONFIG_FILE = "config.json"
 
@@ -57,7 +71,179 @@ def strip_version_prefix(version: str) -> str:
         return version[1:]
     return version
 
-def extract_id_and_version(filename: str, debug_enabled: bool = False) -> Tuple[str, Optional[str]]:
+def version_sort_key(version: Optional[str]) -> Tuple[int, ...]:
+    """
+    Build a numeric sort key from a version string.
+    
+    Args:
+        version: Version string like 'v1.10', can be empty or None
+        
+    Returns:
+        Tuple of the numbers in the version, so v1.10 sorts after v1.9;
+        an empty tuple for missing versions, which sorts first
+    """
+    if not version:
+        return ()
+    # ASCII digits only, like the version key SQL of the database triggers
+    return tuple(int(part) for part in re.findall(r'[0-9]+', version))
+
+# Bit widths of the version parts packed into a version key, most significant
+# first. 63 bits in total, so keys are positive SQLite integers. The major part
+# is wide enough for date versions like v20240131.
+VERSION_PART_BITS = (27, 12, 12, 12)
+
+def pack_version(version: Optional[str]) -> Optional[int]:
+    """
+    Pack a version into an order-preserving integer key.
+    
+    Keys compare like the parsed versions, so 'v1.10' > 'v1.9' is a single
+    integer comparison. Missing parts count as 0, so v1 and v1.0 share a key.
+    Parts beyond the fourth are ignored and parts too large for their bits
+    are clamped, so such versions may tie.
+    
+    database.version_key_sql computes the same key in SQL for the triggers
+    maintaining the version_key columns.
+    
+    Args:
+        version: Version string like 'v1.10', can be empty or None
+        
+    Returns:
+        Integer key, or None if the version contains no number
+    """
+    parts = version_sort_key(version)
+    if not parts:
+        return None
+    key = 0
+    for index, bits in enumerate(VERSION_PART_BITS):
+        part = parts[index] if index < len(parts) else 0
+        key = (key << bits) | min(part, (1 << bits) - 1)
+    return key
+
+class ParsedName(NamedTuple):
+    """
+    Result of parsing a filename.
+    
+    Attributes:
+        dlsite_id: The DLSite ID, or None if the name contains none
+        version: Version in 'v1.2' form, or None if the name contains none
+    """
+    dlsite_id: Optional[str]
+    version: Optional[str]
+
+NO_MATCH = ParsedName(None, None)
+
+# DLSite product prefixes: voice works and games (RJ, RE), console and PC
+# software (VJ, VE), manga (BJ) and general books (RG)
+DEFAULT_DLSITE_PREFIXES = ("RJ", "RE", "VJ", "VE", "BJ", "RG")
+DLSITE_PREFIXES: Tuple[str, ...] = DEFAULT_DLSITE_PREFIXES
+ID_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# Digits in a DLSite product number: 6 for older works, 8 for newer ones
+ID_DIGITS = (6, 8)
+
+def compile_id_pattern(prefixes: Sequence[str]) -> "re.Pattern[str]":
+    """
+    Compile the pattern finding DLSite IDs in filenames.
+    
+    One alternation covers all prefixes, so finding the ID stays a single
+    pass over the name. An ID must not follow a letter and must have 6 to 8
+    digits, so words like 'GENRE2024' or 'CORE3' are not taken for RE IDs.
+    
+    Args:
+        prefixes: Uppercase prefixes like 'RJ' or 'VJ'
+        
+    Returns:
+        Compiled pattern matching a whole ID
+    """
+    # Longest first, so a prefix is never cut short by a shorter one it starts with
+    alternation = "|".join(sorted(prefixes, key=len, reverse=True))
+    low, high = ID_DIGITS
+    return re.compile(f"(?<![A-Za-z])(?:{alternation})\\d{{{low},{high}}}(?!\\d)")
+
+# Precompiled patterns for the ID and the version in parentheses, like "(v1.2)"
+# or "(1.2)". Two searches beat a single combined pattern with lookaheads.
+# set_dlsite_prefixes recompiles ID_PATTERN.
+ID_PATTERN = compile_id_pattern(DEFAULT_DLSITE_PREFIXES)
+VERSION_PATTERN = re.compile(r'\(v?(\d+(?:\.\d+)*)\)')
+_new_parsed_name = tuple.__new__
+
+def set_dlsite_prefixes(prefixes: Sequence[str]) -> None:
+    """
+    Configure the product prefixes recognized in filenames.
+    
+    Recompiles the ID pattern and clears the parse cache, whose results
+    depend on the prefixes.
+    
+    Args:
+        prefixes: Prefixes like 'RJ' or 'VJ'; letters only
+        
+    Raises:
+        ValueError: If no prefix is given or a prefix contains anything but letters
+    """
+    global ID_PATTERN, DLSITE_PREFIXES
+    prefixes = tuple(dict.fromkeys(str(prefix).strip().upper() for prefix in prefixes))
+    if not prefixes or not all(prefix.isascii() and prefix.isalpha() for prefix in prefixes):
+        raise ValueError(f"Invalid DLSite prefixes: {', '.join(prefixes) or 'none'}")
+    ID_PATTERN = compile_id_pattern(prefixes)
+    DLSITE_PREFIXES = prefixes
+    cached_parse_filename.cache_clear()
+
+def get_dlsite_prefixes() -> Tuple[str, ...]:
+    """
+    Get the product prefixes recognized in filenames.
+    
+    Returns:
+        Tuple of the configured prefixes
+    """
+    return DLSITE_PREFIXES
+
+def split_dlsite_id(dlsite_id: str) -> Tuple[str, Optional[int]]:
+    """
+    Split a DLSite ID into its prefix and integer number.
+    
+    Matches the prefix and id_number columns of the database, so
+    'RJ01234567' and 'RJ123456' order numerically.
+    
+    Args:
+        dlsite_id: ID like 'RJ01234567'; bare numbers are treated as RJ IDs
+        
+    Returns:
+        Tuple of (uppercase prefix, number), where number is None if no
+        digits follow the prefix
+    """
+    rest = dlsite_id.lstrip(ID_LETTERS)
+    prefix = dlsite_id[:len(dlsite_id) - len(rest)].upper() or "RJ"
+    digits = len(rest) - len(rest.lstrip("0123456789"))
+    return prefix, int(rest[:digits]) if digits else None
+
+def parse_filename(filename: str) -> ParsedName:
+    """
+    Parse the DLSite ID and version from a filename with precompiled patterns.
+    
+    The extension is ignored the same way os.path.splitext splits it off,
+    but by limiting the searches instead of copying the name.
+    
+    Args:
+        filename: Name of the file to parse
+        
+    Returns:
+        ParsedName with the ID and version; NO_MATCH if the name has no ID
+    """
+    # Like splitext: the last dot starts the extension unless only dots precede it
+    end = filename.rfind('.')
+    if end <= 0 or (filename[0] == '.' and not filename[:end].strip('.')):
+        end = len(filename)
+
+    id_match = ID_PATTERN.search(filename, 0, end)
+    if id_match is None:
+        return NO_MATCH
+    version_match = VERSION_PATTERN.search(filename, 0, end)
+    version = "v" + version_match.group(1) if version_match else None
+    # tuple.__new__ skips the keyword handling of the generated __new__,
+    # which adds up over large scans
+    return _new_parsed_name(ParsedName, (id_match.group(), version))
+
+def extract_id_and_version(filename: str, debug_enabled: bool = False) -> ParsedName:
     """
     Extract DLSite ID and version from filename.
     
@@ -66,55 +252,59 @@ def extract_id_and_version(filename: str, debug_enabled: bool = False) -> Tuple[
         debug_enabled: Flag to enable debug logging
         
     Returns:
-        Tuple containing (DLSite ID, version) where version may be None
+        ParsedName (a (DLSite ID, version) tuple) where version may be None;
+        both are None if the name contains no ID
     """
-    # Remove file extension
-    name_without_ext = os.path.splitext(filename)[0]
-    
+    parsed = parse_filename(filename)
     if debug_enabled:
-        print(f"\n[DEBUG] Analyzing file: '{filename}'")
-        print(f"[DEBUG] Name without extension: '{name_without_ext}'")
-    
-    # Extract just the RJ part first
-    rj_match = re.search(r'(RJ\d+)', name_without_ext)
-    if not rj_match:
-        if debug_enabled:
-            print(f"[DEBUG] No RJ ID found in filename")
-        return None, None
-    
-    dlsite_id = rj_match.group(1)
-    
-    # First try to find version in parentheses with v prefix
-    version_match = re.search(r'\((v?(\d+(\.\d+)*))\)', name_without_ext)
-    
-    # If no version found in parentheses, check for just numbers in parentheses
-    if not version_match:
-        version_match = re.search(r'\((\d+(\.\d+)*)\)', name_without_ext)
-    
-    if version_match:
-        # Get the full version string from the match
-        raw_version = version_match.group(1)
-        if debug_enabled:
-            print(f"[DEBUG] Found version in parentheses: '{raw_version}'")
-        
-        # Remove 'v' prefix if present and add it back in a standardized way
-        if raw_version.lower().startswith('v'):
-            version = raw_version[1:]
-        else:
-            version = raw_version
-        version = f"v{version}"
-        
-        if debug_enabled:
-            print(f"[DEBUG] Standardized version: '{version}'")
-    else:
-        version = None
-        if debug_enabled:
-            print(f"[DEBUG] No version found in filename")
+        log_parse_result(filename, parsed)
+    return parsed
+
+def log_parse_result(filename: str, parsed: ParsedName) -> None:
+    """Print the debug output for a parsed filename."""
+    print(f"\n[DEBUG] Analyzing file: '{filename}'")
+    if parsed.dlsite_id is None:
+        print(f"[DEBUG] No DLSite ID found in filename")
+    elif parsed.version is None:
+        print(f"[DEBUG] No version found in filename")
+    print(f"[DEBUG] Final result - ID: {parsed.dlsite_id}, Version: {parsed.version}")
+
+# Bounded cache of parse results by filename, shared by all scans of this session.
+# Results are immutable, so cached instances can be handed out directly.
+PARSE_CACHE_SIZE = 200_000
+cached_parse_filename = functools.lru_cache(maxsize=PARSE_CACHE_SIZE)(parse_filename)
+
+def parse_many(names: Sequence[str], debug_enabled: bool = False) -> List[ParsedName]:
+    """
+    Parse a batch of filenames through the parse cache.
+    
+    Names parsed before in this session, e.g. files that moved to another
+    folder or all files after the scan configuration changed, are answered
+    from a bounded LRU cache instead of being parsed again.
     
+    Args:
+        names: Filenames to parse
+        debug_enabled: Flag to enable debug logging
+        
+    Returns:
+        ParsedName for every name, in the same order
+    """
+    parse = cached_parse_filename
+    results = [parse(name) for name in names]
     if debug_enabled:
-        print(f"[DEBUG] Final result - ID: {dlsite_id}, Version: {version}")
+        for name, parsed in zip(names, results):
+            log_parse_result(name, parsed)
+    return results
+
+def parse_cache_stats() -> Tuple[int, int]:
+    """
+    Get the hit and miss counts of the parse cache.
     
-    return dlsite_id, version
+    Returns:
+        Tuple of (hits, misses) since the start of the session
+    """
+    info = cached_parse_filename.cache_info()
+    return info.hits, info.misses
 
 def load_config() -> Dict[str, Union[str, bool]]:
     """
@@ -126,7 +316,13 @@ def load_config() -> Dict[str, Union[str, bool]]:
     default_config = {
         'folder_path': None,
         'debug_enabled': False,
-        'theme': 'light'
+        'theme': 'light',
+        'scan_roots': [],
+        'scan_workers': 8,
+        'watch_folders': False,
+        'watch_poll_interval': 10,
+        'dlsite_prefixes': list(DEFAULT_DLSITE_PREFIXES),
+        'backup_retention': {'recent': 3, 'hourly': 24, 'daily': 7, 'weekly': 4}
     }
     
     try:
@@ -157,3 +353,37 @@ def save_config(config: Dict[str, Union[str, bool]]) -> None:
             json.dump(config, f, indent=4)
     except Exception as e:
         print(f"Error saving config: {e}")
+
+def get_scan_roots(folder_path: Optional[str], extra_roots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build the list of folders to scan from configuration.
+    
+    The main folder path always comes first. Additional roots come from the
+    'scan_roots' config entry, where each root is a dictionary with a 'path'
+    and optional 'include' and 'exclude' glob lists and a 'max_depth'
+    (0 scans only the root itself, null scans all subfolders). An entry whose
+    path equals the main folder path supplies the options for that folder.
+    
+    Args:
+        folder_path: Main folder path, may be None
+        extra_roots: Raw 'scan_roots' entries from the configuration
+        
+    Returns:
+        List of roots with 'path', 'include', 'exclude' and 'max_depth' keys
+    """
+    entries = list(extra_roots or [])
+    if folder_path and not any(entry.get('path') == folder_path for entry in entries):
+        entries.insert(0, {'path': folder_path})
+    
+    roots = []
+    for entry in entries:
+        path = entry.get('path')
+        if not path:
+            continue
+        roots.append({
+            'path': os.path.normpath(path),
+            'include': list(entry.get('include') or ['*']),
+            'exclude': list(entry.get('exclude') or []),
+            'max_depth': entry.get('max_depth')
+        })
+    return roots
@@ -18,38 +18,110 @@ Classes:
 Functions:
     main: Initialize and run the main application window
     refresh_table: Update the display table with current data
-    sort_table: Sort table entries by DLSite ID
+    update_table_rows: Update only the given rows in the display table
+    schedule_search: Debounce as-you-type searches
+    start_search: Run a search on the background search worker
+    sort_table: Sort table entries by a column
     add_id: Add a new DLSite ID
     edit_id: Edit an existing DLSite ID
     remove_entry: Remove a DLSite ID from the database
-    check_folder_for_ids: Scan folder for DLSite IDs
+    undo_last_change: Undo the newest change to the entries
+    restore_entries: Restore the entries to an earlier time
+    check_folder_for_ids: Start a background scan of the folder for DLSite IDs
+    cancel_scan: Cancel the running folder scan
+    start_folder_watcher: Start watching the scanned folders for changes
+    stop_folder_watcher: Stop watching the scanned folders
     apply_theme: Apply the current theme to all widgets
+    configure_status_tags: Color table rows by presence status
 """
 
 import os
+import queue
+import sqlite3
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkinter.simpledialog import askstring
-import re
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, Iterable, List, Set, Tuple
 
-from styles import LIGHT_THEME, DARK_THEME, PRESENT_MARKER, MISSING_MARKER
+from styles import (
+    LIGHT_THEME, DARK_THEME, PRESENT_MARKER, MISSING_MARKER, OUTDATED_MARKER, NEWER_MARKER
+)
 from database import (
-    setup_database, backup_database, get_connection,
-    update_marked_status, reset_all_marked_status, add_or_update_id
+    setup_database, get_connection, open_worker_connection,
+    close_connection, sync_marked_status, add_or_update_id, load_scan_dirs,
+    STATUS_MISSING, STATUS_PRESENT, STATUS_OUTDATED, STATUS_NEWER
 )
 from file_utils import (
-    format_version, strip_version_prefix, extract_id_and_version,
-    load_config, save_config
+    format_version, strip_version_prefix,
+    load_config, save_config, get_scan_roots, set_dlsite_prefixes, DEFAULT_DLSITE_PREFIXES
+)
+from scanner import scan_roots, ScanCancelled
+from backup import start_backup, wait_for_backup
+from journal import (
+    journal_batch, last_undoable_batch, undo_last_batch, restore_to_time, journal_start,
+    prune_journal, UndoConflictError
 )
+from watcher import FolderWatcher
+from table_view import VirtualTable
+from search_query import compile_query, can_narrow, plain_terms, matches_terms, QuerySyntaxError
 from config import DEBUG_ENABLED
 
 # Global variables
 FOLDER_PATH: Optional[str] = None
+SCAN_ROOTS: List[Dict[str, Any]] = []
+SCAN_WORKERS: int = 8
+WATCH_FOLDERS: bool = False
+WATCH_POLL_INTERVAL: float = 10
 current_theme: str = 'light'
 root: Optional[tk.Tk] = None
-table: Optional[ttk.Treeview] = None
+table: Optional[VirtualTable] = None
 style: Optional[ttk.Style] = None
+current_search: str = ""
+sort_descending: bool = True
+# Columns in sort priority; clicking a heading moves its column to the front
+sort_columns: List[str] = ["ID"]
+
+# Table columns: heading text and index into the row's sort fields
+COLUMN_HEADINGS = {"ID": "DLSite ID", "Tested": "Tested", "Version": "Version"}
+SORT_FIELDS = {"ID": 0, "Version": 1, "Tested": 2}
+# ID markers and row tags by presence status
+STATUS_MARKERS = {STATUS_PRESENT: PRESENT_MARKER, STATUS_MISSING: MISSING_MARKER,
+                  STATUS_OUTDATED: OUTDATED_MARKER, STATUS_NEWER: NEWER_MARKER}
+STATUS_TAGS = {STATUS_OUTDATED: "outdated", STATUS_NEWER: "newer"}
+
+# Background scan state
+SCAN_POLL_MS = 100
+scan_thread: Optional[threading.Thread] = None
+scan_queue: "queue.Queue[Tuple[Any, ...]]" = queue.Queue()
+scan_cancel_event: Optional[threading.Event] = None
+scan_started_at: float = 0.0
+scan_pending: bool = False
+scan_pending_dirs: Optional[Set[str]] = None
+scan_pending_full: bool = False
+scan_frame: Optional[ttk.Frame] = None
+scan_progress: Optional[ttk.Progressbar] = None
+scan_status_label: Optional[ttk.Label] = None
+
+# Background search state
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_POLL_MS = 20
+search_thread: Optional[threading.Thread] = None
+search_connection: Optional[sqlite3.Connection] = None
+search_requests: "queue.Queue[Optional[Tuple[Any, ...]]]" = queue.Queue()
+search_results: "queue.Queue[Tuple[Any, ...]]" = queue.Queue()
+search_generation: int = 0
+search_after_id: Optional[str] = None
+search_running: bool = False
+
+# Time format of the restore prompt
+RESTORE_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Folder watcher state
+WATCH_POLL_MS = 250
+folder_watcher: Optional[FolderWatcher] = None
+watch_queue: "queue.Queue[Optional[Set[str]]]" = queue.Queue()
 
 def apply_theme() -> None:
     """
@@ -98,6 +170,7 @@ def apply_theme() -> None:
     style.map('Treeview',
              background=[('selected', theme['select_bg'])],
              foreground=[('selected', theme['select_fg'])])
+    configure_status_tags(theme)
 
     # Configure Buttons
     style.configure('TButton',
@@ -168,162 +241,565 @@ def apply_theme() -> None:
     
     # Start recursive update from root
     update_widget_colors(root)
-    
-    # Refresh table to ensure correct styling
-    refresh_table()
 
-def check_folder_for_ids() -> None:
+def check_folder_for_ids(only_dirs: Optional[Set[str]] = None, force_full: bool = False) -> None:
     """
-    Scan the configured folder for DLSite IDs.
+    Start a background scan of the configured folders for DLSite IDs.
     
-    Searches through the configured folder for files containing DLSite IDs,
-    extracts version information if available, and updates the database with
-    their presence status.
+    Args:
+        only_dirs: If given, only these directories are checked for changes,
+            e.g. the directories reported by the folder watcher
+        force_full: List every directory instead of trusting the snapshot
+    
+    The main folder and any additional scan roots are rescanned recursively
+    and incrementally against the persisted scan snapshot on a worker thread,
+    so the window stays responsive. Progress is reported through a queue
+    polled from the Tk main loop, and rows whose presence status changed are
+    updated in the table once the scan completes. If a scan is already
+    running, another one is started as soon as it finishes.
     """
-    if not FOLDER_PATH or not os.path.exists(FOLDER_PATH):
+    global scan_thread, scan_cancel_event, scan_started_at, scan_pending, scan_pending_dirs, scan_pending_full
+    if scan_thread is not None and scan_thread.is_alive():
+        # Merge with any scan already queued; a full scan covers everything
+        if only_dirs is None or (scan_pending and scan_pending_dirs is None):
+            scan_pending_dirs = None
+        elif scan_pending:
+            scan_pending_dirs |= only_dirs
+        else:
+            scan_pending_dirs = set(only_dirs)
+        scan_pending_full = force_full or (scan_pending and scan_pending_full)
+        scan_pending = True
+        return
+    scan_pending = False
+    scan_pending_dirs = None
+    scan_pending_full = False
+
+    roots = get_scan_roots(FOLDER_PATH, SCAN_ROOTS)
+    if not any(os.path.exists(scan_root['path']) for scan_root in roots):
         if DEBUG_ENABLED:
             print(f"[DEBUG] Invalid folder path: {FOLDER_PATH}")
         return
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # First, reset all marked statuses
-    reset_all_marked_status(cursor)
+    scan_cancel_event = threading.Event()
+    scan_started_at = time.monotonic()
+    scan_thread = threading.Thread(
+        target=scan_worker,
+        args=(roots, SCAN_WORKERS, scan_cancel_event, DEBUG_ENABLED, only_dirs, force_full),
+        daemon=True
+    )
+    scan_thread.start()
+
+    # Watcher-triggered scans are small, so they don't flash the status bar
+    if scan_frame is not None and only_dirs is None:
+        scan_status_label.configure(text="Scanning folder...")
+        scan_progress.configure(mode='indeterminate', value=0)
+        scan_progress.start()
+        scan_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+    if root is not None:
+        root.after(SCAN_POLL_MS, poll_scan_queue)
+
+def scan_worker(roots: List[Dict[str, Any]], workers: int, cancel_event: threading.Event,
+                debug_enabled: bool, only_dirs: Optional[Set[str]] = None,
+                force_full: bool = False) -> None:
+    """
+    Run a folder scan on a worker thread.
     
-    # Get all files in the folder
+    Args:
+        roots: Scan roots as returned by get_scan_roots
+        workers: Number of directories listed concurrently
+        cancel_event: Event that aborts the scan when set
+        debug_enabled: Flag to enable debug logging
+        only_dirs: If given, only these directories are checked for changes
+        force_full: List every directory instead of trusting the snapshot
+    
+    Uses its own database connection, since SQLite connections cannot be
+    shared between threads, and reports progress and the final result
+    through scan_queue.
+    """
+    conn = open_worker_connection()
     try:
-        files = [f for f in os.listdir(FOLDER_PATH) if os.path.isfile(os.path.join(FOLDER_PATH, f))]
-        if DEBUG_ENABLED:
-            print(f"\n[DEBUG] Checking folder: {FOLDER_PATH}")
-            print(f"[DEBUG] Found {len(files)} files:")
-            for f in files:
-                print(f"  - {f}")
-    except Exception as e:
-        if DEBUG_ENABLED:
-            print(f"[DEBUG] Error reading folder: {e}")
+        changed, hit_rate = scan_roots(
+            conn, roots, debug_enabled,
+            progress=lambda done, total, hit_rate: scan_queue.put(("progress", done, total, hit_rate)),
+            cancel_event=cancel_event,
+            workers=workers,
+            only_dirs=only_dirs,
+            force_full=force_full
+        )
+        scan_queue.put(("done", changed, hit_rate))
+    except ScanCancelled:
+        scan_queue.put(("cancelled",))
+    except (OSError, sqlite3.Error) as e:
+        scan_queue.put(("error", e))
+    finally:
+        conn.close()
+
+def poll_scan_queue() -> None:
+    """
+    Apply messages from the scan worker on the Tk main thread.
+    
+    Updates the progress bar and the files-per-second and parse cache
+    readout, and applies the scan result to the table when the worker finishes.
+    """
+    finished = False
+    while True:
+        try:
+            message = scan_queue.get_nowait()
+        except queue.Empty:
+            break
+
+        kind = message[0]
+        if kind == "progress":
+            _, done, total, hit_rate = message
+            elapsed = max(time.monotonic() - scan_started_at, 1e-6)
+            if scan_frame is not None:
+                if total:
+                    scan_progress.stop()
+                    scan_progress.configure(mode='determinate', maximum=total, value=min(done, total))
+                rates = f"{done / elapsed:,.0f} files/s"
+                if hit_rate is not None:
+                    rates += f", {hit_rate:.0%} parse cache hits"
+                scan_status_label.configure(text=f"Scanning folder... {done:,} files ({rates})")
+        elif kind == "done":
+            finished = True
+            _, changed, hit_rate = message
+            if DEBUG_ENABLED:
+                hits = "no filenames parsed" if hit_rate is None else f"{hit_rate:.0%} parse cache hits"
+                print(f"[DEBUG] Folder scan finished in {time.monotonic() - scan_started_at:.1f} s, {hits}")
+            update_table_rows(changed)
+            refresh_watched_dirs()
+        elif kind == "cancelled":
+            finished = True
+            if DEBUG_ENABLED:
+                print("[DEBUG] Folder scan cancelled")
+        elif kind == "error":
+            finished = True
+            if DEBUG_ENABLED:
+                print(f"[DEBUG] Error reading folder: {message[1]}")
+
+    if finished or scan_thread is None or not scan_thread.is_alive() and scan_queue.empty():
+        if scan_frame is not None:
+            scan_progress.stop()
+            scan_frame.pack_forget()
+        # The worker still closes its connection after its last message; wait
+        # for it, or the pending scan below would be queued behind it again
+        if scan_thread is not None:
+            scan_thread.join()
+        if scan_pending:
+            check_folder_for_ids(scan_pending_dirs, scan_pending_full)
         return
+    root.after(SCAN_POLL_MS, poll_scan_queue)
+
+def cancel_scan() -> None:
+    """
+    Cancel the running folder scan.
+    
+    The worker stops at its next checkpoint without writing anything, so the
+    database and scan snapshot keep their previous state.
+    """
+    global scan_pending
+    scan_pending = False
+    if scan_cancel_event is not None:
+        scan_cancel_event.set()
+
+def start_folder_watcher() -> None:
+    """
+    Start watching the scanned folders for changes.
     
-    # Process each file
-    for filename in files:
-        full_path = os.path.join(FOLDER_PATH, filename)
+    File creations, deletions and renames are coalesced by the watcher and
+    applied through an incremental scan of just the affected directories, so
+    presence markers stay current without pressing Refresh.
+    """
+    global folder_watcher
+    stop_folder_watcher()
+    folder_watcher = FolderWatcher(watch_queue, poll_interval=WATCH_POLL_INTERVAL)
+    refresh_watched_dirs()
+    folder_watcher.start()
+    if DEBUG_ENABLED:
+        print(f"[DEBUG] Watching folders using {folder_watcher.backend}")
+    if root is not None:
+        root.after(WATCH_POLL_MS, poll_watch_queue)
+
+def stop_folder_watcher() -> None:
+    """
+    Stop watching the scanned folders.
+    """
+    global folder_watcher
+    if folder_watcher is not None:
+        folder_watcher.stop()
+        folder_watcher = None
+
+def refresh_watched_dirs() -> None:
+    """
+    Point the folder watcher at the directories in the current scan snapshot.
+    """
+    if folder_watcher is None:
+        return
+    dirs = load_scan_dirs(get_connection().cursor())
+    folder_watcher.update_dirs({path: mtime_ns for path, (mtime_ns, _) in dirs.items()})
+
+def poll_watch_queue() -> None:
+    """
+    Turn changes reported by the folder watcher into incremental scans.
+    """
+    if folder_watcher is None:
+        return
+    changed: Optional[Set[str]] = set()
+    while True:
+        try:
+            dirs = watch_queue.get_nowait()
+        except queue.Empty:
+            break
+        # None means events were lost, which needs a scan of everything
+        changed = None if dirs is None or changed is None else changed | dirs
+    if changed is None or changed:
         if DEBUG_ENABLED:
-            print(f"\n[DEBUG] Processing file: {full_path}")
-        
-        dlsite_id, version = extract_id_and_version(filename, DEBUG_ENABLED)
-        if dlsite_id:
-            # Check if this ID exists with exact version match
-            query = """
-                SELECT rowid, tested, version, dlsite_id 
-                FROM dlsite_ids 
-                WHERE dlsite_id = ?
-            """
-            params = [dlsite_id]
-            
-            if version:
-                # If version exists, add it to the query
-                query += " AND version = ?"
-                params.append(version)
-            else:
-                # If no version, match entries with no version or empty version
-                query += " AND (version IS NULL OR version = '')"
-            
-            if DEBUG_ENABLED:
-                print(f"[DEBUG] Executing query: {query}")
-                print(f"[DEBUG] With parameters: {params}")
-            
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            
-            if result:
-                rowid, tested, db_version, db_id = result
-                if DEBUG_ENABLED:
-                    print(f"[DEBUG] Found exact match in DB:")
-                    print(f"  DB ID: {db_id}")
-                    print(f"  DB Version: '{db_version}'")
-                    print(f"  File Version: '{version}'")
-                # Mark existing entry as present
-                update_marked_status(cursor, rowid, 1)
-            elif DEBUG_ENABLED:
-                print(f"[DEBUG] No exact match found in DB")
-                cursor.execute("SELECT rowid, version FROM dlsite_ids WHERE dlsite_id = ?", (dlsite_id,))
-                other_versions = cursor.fetchall()
-                if other_versions:
-                    print(f"[DEBUG] Other versions in DB for {dlsite_id}:")
-                    for v in other_versions:
-                        print(f"  - '{v[1]}'")
-
-    conn.commit()
-    conn.close()
-    
-    # Refresh the table display without checking folder again
-    refresh_table(check_folder=False)
-
-def refresh_table(search_query: Optional[str] = None, check_folder: bool = True) -> None:
+            print(f"[DEBUG] Watcher reported changes in: {'all folders' if changed is None else sorted(changed)}")
+        check_folder_for_ids(changed)
+    root.after(WATCH_POLL_MS, poll_watch_queue)
+
+def refresh_table(search_query: Optional[str] = None, check_folder: bool = False,
+                  force_full: bool = False) -> None:
     """
     Refresh the table with current data.
     
     Args:
         search_query: Optional search string to filter results
         check_folder: Whether to scan the folder for IDs before refreshing
-    
-    Updates the table display with the latest data from the database,
-    optionally filtering by a search query. Can also update file presence
-    status by scanning the configured folder.
+        force_full: Whether that scan lists every directory instead of
+            trusting the scan snapshot, for an explicit refresh
+    
+    Reloads the rows from the database, optionally filtering by a search
+    query, and applies only the difference to the table, so the scroll
+    position and selection are kept. Only rescans the configured folder when
+    explicitly asked to, since edits keep the table up to date through
+    update_table_rows. The scan runs in the background and updates affected
+    rows when it finishes.
     """
-    global table
+    global table, current_search
     if table is None:
         return
 
-    # Check for files in folder first if requested
+    cancel_search()
+    try:
+        rows = fetch_table_rows(get_connection().cursor(), search_query or "")
+    except QuerySyntaxError as e:
+        messagebox.showerror("Search", f"Invalid search query: {e}")
+        return
+    current_search = search_query or ""
+
+    inserted, deleted, changed = table.sync_rows(rows)
+    if DEBUG_ENABLED:
+        print(f"[DEBUG] Table refresh: {len(inserted)} inserted, {len(deleted)} deleted, "
+              f"{len(changed)} changed")
+    
+    # Check for files in folder in the background if requested
     if check_folder:
-        check_folder_for_ids()
+        check_folder_for_ids(force_full=force_full)
+
+def fetch_table_rows(cursor: sqlite3.Cursor, search_query: str,
+                     rowids: Optional[List[int]] = None) -> List[Tuple[Any, ...]]:
+    """
+    Select the rows shown in the table.
+    
+    Args:
+        cursor: SQLite cursor object
+        search_query: Search query to filter by, or "" for all rows
+        rowids: If given, only these rows are selected (if they match)
         
-    for item in table.get_children():
-        table.delete(item)
-
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    if search_query:
-        # Search in dlsite_id field
-        cursor.execute("""
-            SELECT rowid, dlsite_id, tested, version, marked 
-            FROM dlsite_ids 
-            WHERE dlsite_id LIKE ? 
-            ORDER BY dlsite_id""", 
-            (f"%{search_query}%",))
+    Returns:
+        List of (rowid, dlsite_id, tested, version, marked, prefix, id_number, version_key) tuples
+    
+    Raises:
+        QuerySyntaxError: If the search query is malformed
+    """
+    # The whole query compiles into one indexed WHERE clause
+    condition, params = compile_query(cursor, search_query)
+    sql = f"""
+        SELECT rowid, dlsite_id, tested, version, marked, prefix, id_number, version_key
+        FROM dlsite_ids 
+        WHERE {condition}"""
+    if rowids is None:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    rows = []
+    # Stay well below SQLite's bound parameter limit
+    for start in range(0, len(rowids), 500):
+        chunk = rowids[start:start + 500]
+        cursor.execute(f"{sql} AND rowid IN ({','.join('?' * len(chunk))})", params + chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def filter_rows(rows: List[Tuple[Any, ...]], search_query: str) -> List[Tuple[Any, ...]]:
+    """
+    Filter already loaded table rows by a plain text search query.
+    
+    Args:
+        rows: Rows as returned by fetch_table_rows
+        search_query: Search query without field terms (see plain_terms)
+        
+    Returns:
+        The rows whose DLSite ID contains every search term, ignoring case
+    """
+    terms = plain_terms(search_query) or []
+    return [row for row in rows if matches_terms(row[1], terms)]
+
+def schedule_search(search_query: str) -> None:
+    """
+    Debounce as-you-type searches.
+    
+    Args:
+        search_query: Current contents of the search bar
+    
+    Every keystroke restarts the timer, so the search only runs once typing
+    pauses for SEARCH_DEBOUNCE_MS.
+    """
+    global search_after_id
+    if root is None:
+        return
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+    search_after_id = root.after(SEARCH_DEBOUNCE_MS, start_search, search_query)
+
+def start_search(search_query: str) -> None:
+    """
+    Run a search on the background search worker.
+    
+    Args:
+        search_query: Search string to filter by
+    
+    If the new query only extends the text terms of the query currently
+    shown, the results can only shrink, so the worker narrows the displayed
+    rows in memory instead of querying the database. A query still running for an older search is
+    interrupted, and stale results are discarded.
+    """
+    global search_thread, search_generation, search_after_id, search_running
+    # Return searches right away; drop the debounced search of the same text
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+        search_after_id = None
+    if table is None:
+        return
+    if search_query == current_search and not search_running:
+        return
+
+    polling = search_running
+    cancel_search()
+    search_generation += 1
+    if can_narrow(current_search, search_query):
+        narrow_rows: Optional[List[Tuple[Any, ...]]] = list(table.rows)
     else:
-        cursor.execute("""
-            SELECT rowid, dlsite_id, tested, version, marked 
-            FROM dlsite_ids 
-            ORDER BY dlsite_id""")
+        narrow_rows = None
+
+    if search_thread is None or not search_thread.is_alive():
+        search_thread = threading.Thread(target=search_worker, name="search-worker", daemon=True)
+        search_thread.start()
+    search_requests.put((search_generation, search_query, narrow_rows))
+    search_running = True
+    if not polling:
+        root.after(SEARCH_POLL_MS, poll_search_results)
+
+def cancel_search() -> None:
+    """
+    Invalidate the running search and interrupt its database query.
+    """
+    global search_generation, search_running
+    search_generation += 1
+    search_running = False
+    if search_connection is not None:
+        # Safe to call from another thread; a no-op when nothing is running
+        search_connection.interrupt()
+
+def search_worker() -> None:
+    """
+    Run search requests on a background thread.
+    
+    Uses its own database connection and only ever works on the newest
+    request in the queue, so bursts of keystrokes don't queue up queries.
+    A None request stops the worker.
+    """
+    global search_connection
+    search_connection = open_worker_connection()
+    try:
+        while True:
+            request = search_requests.get()
+            while not search_requests.empty():
+                request = search_requests.get_nowait()
+            if request is None:
+                break
+
+            generation, search_query, narrow_rows = request
+            if generation != search_generation:
+                continue
+            try:
+                if narrow_rows is not None:
+                    rows = filter_rows(narrow_rows, search_query)
+                else:
+                    rows = fetch_table_rows(search_connection.cursor(), search_query)
+            except sqlite3.OperationalError as e:
+                if generation != search_generation:
+                    # Interrupted by a newer search, which posts its own result
+                    if DEBUG_ENABLED:
+                        print(f"[DEBUG] Search for '{search_query}' stopped: {e}")
+                    continue
+                # Post the failure, so the poll loop stops waiting for a result
+                rows = e
+            except QuerySyntaxError as e:
+                # Usually a query that is still being typed; keep the current results
+                rows = e
+            search_results.put((generation, search_query, rows))
+    finally:
+        search_connection.close()
+        search_connection = None
+
+def stop_search_worker() -> None:
+    """
+    Stop the background search worker.
+    """
+    cancel_search()
+    if search_thread is not None:
+        search_requests.put(None)
+
+def poll_search_results() -> None:
+    """
+    Apply the newest search result on the Tk main thread.
+    
+    Results of searches that were superseded by a newer one are dropped, and
+    a search that failed keeps the current results.
+    """
+    global current_search, search_running
+    while True:
+        try:
+            generation, search_query, rows = search_results.get_nowait()
+        except queue.Empty:
+            break
+        if generation != search_generation:
+            continue
+        search_running = False
+        if isinstance(rows, QuerySyntaxError):
+            if DEBUG_ENABLED:
+                print(f"[DEBUG] Invalid search query '{search_query}': {rows}")
+            continue
+        if isinstance(rows, sqlite3.Error):
+            if DEBUG_ENABLED:
+                print(f"[DEBUG] Search for '{search_query}' failed: {rows}")
+            continue
+        current_search = search_query
+        inserted, deleted, changed = table.sync_rows(rows)
+        if DEBUG_ENABLED:
+            print(f"[DEBUG] Search '{search_query}': {len(rows)} rows "
+                  f"({len(inserted)} inserted, {len(deleted)} deleted)")
+
+    if search_running:
+        root.after(SEARCH_POLL_MS, poll_search_results)
+
+def format_row(dlsite_id: str, tested: str, version: Optional[str], marked: int) -> Tuple[str, str, str]:
+    """
+    Format a database row for display in the table.
     
-    rows = cursor.fetchall()
+    Args:
+        dlsite_id: The DLSite ID
+        tested: Tested status ("Yes" or "No")
+        version: Stored version string, may be empty or None
+        marked: Presence status of the ID in the scanned folders (STATUS_*)
+        
+    Returns:
+        Tuple of (display ID, tested, display version)
+    """
+    # Format version for display
+    display_version = format_version(version) if version else "-"
     
-    for rowid, dlsite_id, tested, version, marked in rows:
-        # Format version for display
-        display_version = format_version(version) if version else "-"
+    # Format the ID with prefix based on presence, ensuring consistent spacing
+    prefix = STATUS_MARKERS.get(marked, MISSING_MARKER)
+    display_id = f"{prefix} - {dlsite_id}".strip()  # Ensure no extra whitespace
+    return display_id, tested, display_version
+
+def format_table_row(row: Tuple[Any, ...]) -> Tuple[str, str, str]:
+    """
+    Format a table model row (rowid, dlsite_id, tested, version, marked, ...) for display.
+    
+    Args:
+        row: Row as selected from the database, starting with the rowid
         
-        # Format the ID with prefix based on tested status and presence, ensuring consistent spacing
-        prefix = PRESENT_MARKER if marked else MISSING_MARKER
-        display_id = f"{prefix} - {dlsite_id}".strip()  # Ensure no extra whitespace
-        table.insert("", "end", iid=rowid, values=(display_id, tested, display_version))
+    Returns:
+        Tuple of (display ID, tested, display version)
+    """
+    return format_row(*row[1:5])
+
+def status_tags(row: Tuple[Any, ...]) -> Tuple[str, ...]:
+    """
+    Get the Treeview tags of a table model row from its presence status.
+    
+    Args:
+        row: Row as selected from the database, starting with the rowid
+        
+    Returns:
+        Tuple with the status tag for outdated or newer copies, empty otherwise
+    """
+    tag = STATUS_TAGS.get(row[4])
+    return (tag,) if tag else ()
+
+def configure_status_tags(theme: Dict[str, str]) -> None:
+    """
+    Color table rows by presence status.
+    
+    Args:
+        theme: Theme whose colors to use
+    """
+    table.tag_configure("outdated", foreground=theme['outdated_fg'])
+    table.tag_configure("newer", foreground=theme['newer_fg'])
 
-    conn.close()
+def update_table_rows(rowids: Iterable[int]) -> None:
+    """
+    Update only the given rows in the table.
+    
+    Args:
+        rowids: Row IDs that were added, changed or deleted in the database
     
-    # Force initial descending sort
-    sort_table(True)
+    Re-reads the given rows from the database and inserts, updates, moves or
+    deletes just those rows in the table model, leaving the rest untouched.
+    Rows that no longer match the current search are removed from the view.
+    """
+    rowids = [int(rowid) for rowid in rowids]
+    if table is None or not rowids:
+        return
+
+    # Deleted rows and rows no longer matching the search are not returned
+    matching = fetch_table_rows(get_connection().cursor(), current_search, rowids)
+    matching_rowids = {row[0] for row in matching}
+    table.remove_rows(rowid for rowid in rowids if rowid not in matching_rowids)
+    table.upsert_rows(matching)
 
 # Folder path management functions
 def load_folder_path() -> None:
     """
     Load the folder path from the configuration file.
     """
-    global FOLDER_PATH, current_theme
+    global FOLDER_PATH, SCAN_ROOTS, SCAN_WORKERS, WATCH_FOLDERS, WATCH_POLL_INTERVAL, current_theme
     config = load_config()
     FOLDER_PATH = config['folder_path']
+    SCAN_ROOTS = config['scan_roots']
+    SCAN_WORKERS = config['scan_workers']
+    WATCH_FOLDERS = config['watch_folders']
+    WATCH_POLL_INTERVAL = config['watch_poll_interval']
     current_theme = config['theme']
+    apply_dlsite_prefixes(config['dlsite_prefixes'])
+
+def apply_dlsite_prefixes(prefixes: List[str]) -> None:
+    """
+    Configure the DLSite product prefixes recognized in filenames.
+    
+    Falls back to the default prefixes if the configured ones are invalid.
+    
+    Args:
+        prefixes: Prefixes from the configuration, like ["RJ", "VJ"]
+    """
+    try:
+        set_dlsite_prefixes(prefixes)
+    except (TypeError, ValueError) as e:
+        print(f"Error in config: {e}, using the default DLSite prefixes")
+        set_dlsite_prefixes(DEFAULT_DLSITE_PREFIXES)
 
 def save_folder_path(folder_path: str) -> None:
     """
@@ -334,12 +810,15 @@ def save_folder_path(folder_path: str) -> None:
     """
     global FOLDER_PATH
     FOLDER_PATH = folder_path
-    config = {
+    # Merge into the stored config so other settings like scan_roots are kept
+    config = load_config()
+    config.update({
         'folder_path': FOLDER_PATH,
         'theme': current_theme
-    }
+    })
     save_config(config)
-    refresh_table()
+    # The folder changed, so this is one of the few places that scans the disk
+    check_folder_for_ids()
 
 def prompt_for_folder_path() -> None:
     """
@@ -348,7 +827,6 @@ def prompt_for_folder_path() -> None:
     folder_path = filedialog.askdirectory()
     if folder_path:
         save_folder_path(folder_path)
-        refresh_table()  # Refresh to show any new IDs from the selected folder
 
         # Create confirmation window with theme support
         confirm_window = tk.Toplevel(root)
@@ -388,38 +866,51 @@ def prompt_for_folder_path() -> None:
         confirm_window.wait_window()
 
 # Table update functions
-def sort_table(reverse: bool = True) -> None:
+def row_sort_fields(row: Tuple[Any, ...]) -> Tuple[Any, ...]:
     """
-    Sort the table by DLSite ID.
+    Precompute the sortable fields of a table model row.
     
     Args:
-        reverse: Whether to sort in descending (True) or ascending (False) order
-    
-    Sorts the table entries by their DLSite ID, ignoring the presence markers.
-    The sort order toggles between ascending and descending when clicking the
-    column header.
+        row: Row as selected from the database, starting with the rowid
+        
+    Returns:
+        Tuple of (ID key, version key, tested flag), indexed by SORT_FIELDS
+    """
+    _, dlsite_id, tested, version, _, prefix, id_number, version_key = row
+    # IDs sort by prefix and integer number, so 6 and 8 digit numbers order
+    # correctly; IDs without a number sort first within their prefix
+    id_key = (prefix, -1 if id_number is None else id_number, dlsite_id)
+    # Versions sort by their packed key, with missing versions first
+    version_field = (-1 if version_key is None else version_key, version or "")
+    return id_key, version_field, tested == "Yes"
+
+def sort_table(column: str = "ID", reverse: bool = True) -> None:
     """
-    # Get all items from the table
-    items = [(table.set(item, "ID"), item) for item in table.get_children()]
+    Sort the table by a column.
     
-    def natural_sort_key(id_str: str) -> str:
-        # Extract the ID part after the marker, ignoring the marker character
-        id_part = id_str.split(" - ", 1)[1] if " - " in id_str else id_str
-        
-        # For numeric IDs, pad them with zeros to align with RJ format
-        if id_part.isdigit():
-            return f"RJ{int(id_part):08d}"
-        return id_part
+    Args:
+        column: Column to sort by ("ID", "Tested" or "Version")
+        reverse: Whether to sort in descending (True) or ascending (False) order
     
-    # Sort items based on the ID
-    items.sort(key=lambda x: natural_sort_key(x[0]), reverse=reverse)
+    The clicked column becomes the primary sort key and the previously sorted
+    columns break ties, so sorting by Tested and then by Version keeps equal
+    versions grouped by their tested status. IDs sort by their numeric part,
+    ignoring the presence markers. Clicking the same header again toggles
+    between ascending and descending order.
+    """
+    global sort_descending, sort_columns
+    sort_descending = reverse
+    sort_columns = [column] + [other for other in sort_columns if other != column]
     
-    # Reorder items in the table
-    for index, (_, item) in enumerate(items):
-        table.move(item, "", index)
+    table.set_sort([SORT_FIELDS[name] for name in sort_columns], reverse)
     
-    # Update the command to toggle the sort order next time
-    table.heading("ID", command=lambda: sort_table(not reverse))
+    # Show the direction on the sorted column and update the header commands
+    for name, text in COLUMN_HEADINGS.items():
+        if name == column:
+            table.heading(name, text=f"{text} {'▼' if reverse else '▲'}",
+                          command=lambda: sort_table(column, not reverse))
+        else:
+            table.heading(name, text=text, command=lambda name=name: sort_table(name, False))
 
 # ID management functions
 def add_id() -> None:
@@ -499,7 +990,7 @@ def add_id() -> None:
     save_button = ttk.Button(
         button_frame,
         text="Save",
-        command=lambda: save_id(id_entry.get(), version_entry.get(), tested_var.get()),
+        command=lambda: save_id(id_entry.get(), version_entry.get(), tested_var.get(), add_window),
         style='Large.TButton'
     )
     save_button.pack(side=tk.LEFT)
@@ -515,48 +1006,35 @@ def add_id() -> None:
     
     add_window.wait_window()
 
-def save_id(dlsite_id: str, version: str, tested: str) -> None:
+def save_id(dlsite_id: str, version: str, tested: str, window: tk.Toplevel) -> None:
     if not dlsite_id:
         messagebox.showerror("Error", "ID cannot be empty.")
         return
 
     # Standardize version format
-    if version:
-        if version.lower().startswith('v'):
-            version = version[1:]
-        version = f"v{version}"
-    else:
-        version = ""
+    version = format_version(version)
 
     if DEBUG_ENABLED:
         print(f"[DEBUG] Adding entry - ID: {dlsite_id}, Version: '{version}'")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Check for duplicate entry
-    cursor.execute(
-        "SELECT rowid FROM dlsite_ids WHERE dlsite_id = ? AND version = ?",
-        (dlsite_id, version)
-    )
-    if cursor.fetchone():
+    # Add the new entry; the unique (dlsite_id, version) index rejects duplicates
+    try:
+        with journal_batch(f"Add {dlsite_id}") as cursor:
+            cursor.execute(
+                "INSERT INTO dlsite_ids (dlsite_id, version, tested) VALUES (?, ?, ?)",
+                (dlsite_id, version, tested)
+            )
+            rowid = cursor.lastrowid
+            sync_marked_status(cursor, [rowid])
+    except sqlite3.IntegrityError:
         messagebox.showerror(
             "Error",
             f"An entry with ID {dlsite_id} and version {version} already exists."
         )
-        conn.close()
         return
-
-    # Add the new entry
-    cursor.execute(
-        "INSERT INTO dlsite_ids (dlsite_id, version, tested) VALUES (?, ?, ?)",
-        (dlsite_id, version, tested)
-    )
-    conn.commit()
-    conn.close()
         
-    refresh_table()
-    add_window.destroy()
+    update_table_rows([rowid])
+    window.destroy()
 
 def edit_id(event: Optional[tk.Event] = None) -> None:
     """
@@ -581,11 +1059,9 @@ def edit_id(event: Optional[tk.Event] = None) -> None:
     entry_id = selected_items[0]
     
     # Get current values
-    conn = get_connection()
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT dlsite_id, tested, version FROM dlsite_ids WHERE rowid = ?", (entry_id,))
     current_values = cursor.fetchone()
-    conn.close()
     
     if not current_values:
         messagebox.showerror("Error", "Could not find the selected entry.")
@@ -688,7 +1164,7 @@ def edit_id(event: Optional[tk.Event] = None) -> None:
     
     edit_window.wait_window()
 
-def save_changes(entry_id: str, dlsite_id: str, version: str, tested: str, window: tk.Toplevel) -> None:
+def save_changes(entry_id: int, dlsite_id: str, version: str, tested: str, window: tk.Toplevel) -> None:
     new_id = dlsite_id.strip()
     new_tested = tested
     new_version = version.strip()
@@ -698,45 +1174,29 @@ def save_changes(entry_id: str, dlsite_id: str, version: str, tested: str, windo
         return
 
     # Standardize version format
-    if new_version:
-        if new_version.lower().startswith('v'):
-            new_version = new_version[1:]
-        new_version = f"v{new_version}"
-    else:
-        new_version = ""
+    new_version = format_version(new_version)
 
     if DEBUG_ENABLED:
         print(f"[DEBUG] Updating entry - ID: {new_id}, Version: '{new_version}'")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-        
-    # Check for duplicate entry
-    cursor.execute("""
-        SELECT rowid FROM dlsite_ids 
-        WHERE dlsite_id = ? AND version = ? AND rowid != ?
-    """, (new_id, new_version, entry_id))
-        
-    if cursor.fetchone():
+    # Update the entry; the unique (dlsite_id, version) index rejects duplicates
+    try:
+        with journal_batch(f"Edit {new_id}") as cursor:
+            cursor.execute("""
+                UPDATE dlsite_ids 
+                SET dlsite_id = ?, tested = ?, version = ? 
+                WHERE rowid = ?
+            """, (new_id, new_tested, new_version, entry_id))
+            sync_marked_status(cursor, [entry_id])
+    except sqlite3.IntegrityError:
         messagebox.showerror(
             "Error",
             f"An entry with ID {new_id} and version {new_version} already exists."
         )
-        conn.close()
         return
-
-    # Update the entry
-    cursor.execute("""
-        UPDATE dlsite_ids 
-        SET dlsite_id = ?, tested = ?, version = ? 
-        WHERE rowid = ?
-    """, (new_id, new_tested, new_version, entry_id))
-        
-    conn.commit()
-    conn.close()
         
-    # Refresh table and close window
-    refresh_table()
+    # Update the edited row and close window
+    update_table_rows([entry_id])
     window.destroy()
 
 def remove_entry() -> None:
@@ -756,15 +1216,69 @@ def remove_entry() -> None:
         return
 
     entry_id = selected_item[0]
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT dlsite_id FROM dlsite_ids WHERE rowid = ?", (entry_id,))
+    row = cursor.fetchone()
+
+    with journal_batch(f"Delete {row[0] if row else entry_id}") as cursor:
+        cursor.execute("DELETE FROM dlsite_ids WHERE rowid = ?", (entry_id,))
+
+    update_table_rows([entry_id])
+
+def undo_last_change(event: Optional[tk.Event] = None) -> None:
+    """
+    Undo the newest change to the entries.
+    
+    Args:
+        event: Optional event object from the keyboard shortcut
+    
+    Reverts the newest add, edit, delete or restore using the change journal,
+    after confirmation. Repeated undos step further back.
+    """
+    cursor = get_connection().cursor()
+    found = last_undoable_batch(cursor)
+    if found is None:
+        messagebox.showinfo("Undo", "There is nothing to undo.")
+        return
+    if not messagebox.askyesno("Confirm Undo", f"Undo '{found[1]}'?"):
+        return
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    try:
+        undone = undo_last_batch()
+    except UndoConflictError as e:
+        messagebox.showerror("Error", str(e))
+        return
+    if undone is not None:
+        update_table_rows(undone[1])
 
-    cursor.execute("DELETE FROM dlsite_ids WHERE rowid = ?", (entry_id,))
-    conn.commit()
-    conn.close()
+def restore_entries() -> None:
+    """
+    Restore the entries to an earlier time.
+    
+    Asks for a date and time and reverts every change made after it using
+    the change journal. The restore itself can be undone.
+    """
+    start = journal_start(get_connection().cursor())
+    if start is None:
+        messagebox.showinfo("Restore", "No changes have been recorded yet.")
+        return
 
-    refresh_table()
+    earliest = time.strftime(RESTORE_TIME_FORMAT, time.localtime(start))
+    answer = askstring("Restore Entries",
+                       f"Restore the entries to (YYYY-MM-DD HH:MM), changes are recorded since {earliest}:",
+                       initialvalue=time.strftime(RESTORE_TIME_FORMAT))
+    if not answer:
+        return
+    try:
+        timestamp = time.mktime(time.strptime(answer.strip(), RESTORE_TIME_FORMAT))
+    except ValueError:
+        messagebox.showerror("Error", f"Could not read the time '{answer}'.")
+        return
+    if not messagebox.askyesno("Confirm Restore",
+                               f"Revert all changes to the entries made after {answer.strip()}?"):
+        return
+
+    update_table_rows(restore_to_time(timestamp))
 
 # Debug logging functions
 def toggle_debug() -> None:
@@ -787,10 +1301,11 @@ def show_settings() -> None:
     - Folder path for scanning
     - Theme selection (light/dark)
     - Debug mode toggle
+    - Restoring the entries to an earlier time
     """
     settings_window = tk.Toplevel(root)
     settings_window.title("Settings")
-    settings_window.geometry("400x320")
+    settings_window.geometry("400x450")
     settings_window.resizable(False, False)
     settings_window.transient(root)  # Make it modal
     settings_window.grab_set()  # Make it modal
@@ -884,17 +1399,46 @@ def show_settings() -> None:
                                 command=update_folder_path)
     change_path_btn.pack(padx=5, pady=5)
     
+    # Scan section with border
+    watch_var = tk.BooleanVar(value=WATCH_FOLDERS)
+    scan_settings_frame = tk.LabelFrame(main_frame, text="Scan Settings",
+                                      bg=theme['bg'],
+                                      fg=theme['fg'],
+                                      bd=2,
+                                      relief='groove')
+    scan_settings_frame.pack(fill=tk.X, pady=(0, 10), padx=5)
+    
+    watch_check = ttk.Checkbutton(scan_settings_frame, text="Watch Folders for Changes",
+                                 variable=watch_var,
+                                 style='Settings.TCheckbutton')
+    watch_check.pack(padx=5, pady=5)
+    
+    # Database section with border
+    database_frame = tk.LabelFrame(main_frame, text="Database Settings",
+                                 bg=theme['bg'],
+                                 fg=theme['fg'],
+                                 bd=2,
+                                 relief='groove')
+    database_frame.pack(fill=tk.X, pady=(0, 10), padx=5)
+    
+    restore_btn = ttk.Button(database_frame, text="Restore Entries to an Earlier Time",
+                            command=restore_entries)
+    restore_btn.pack(padx=5, pady=5)
+    
     def apply_settings() -> None:
-        global current_theme, DEBUG_ENABLED
+        global current_theme, DEBUG_ENABLED, WATCH_FOLDERS
         new_debug = debug_var.get()
         new_theme = theme_var.get()
+        new_watch = watch_var.get()
         
         # Save all settings
-        config = {
+        config = load_config()
+        config.update({
             'debug_enabled': new_debug,
             'theme': new_theme,
-            'folder_path': FOLDER_PATH
-        }
+            'folder_path': FOLDER_PATH,
+            'watch_folders': new_watch
+        })
         save_config(config)
         
         # Apply changes
@@ -902,6 +1446,12 @@ def show_settings() -> None:
         if new_theme != current_theme:
             current_theme = new_theme
             apply_theme()
+        if new_watch != WATCH_FOLDERS:
+            WATCH_FOLDERS = new_watch
+            if WATCH_FOLDERS:
+                start_folder_watcher()
+            else:
+                stop_folder_watcher()
         
         settings_window.destroy()
         messagebox.showinfo("Settings", "Settings have been saved successfully!")
@@ -925,7 +1475,9 @@ def main() -> None:
     loads configuration, and starts the main event loop. This is the entry point
     for the graphical interface.
     """
-    global root, table, style, FOLDER_PATH, current_theme, DEBUG_ENABLED
+    global root, table, style, FOLDER_PATH, SCAN_ROOTS, SCAN_WORKERS, current_theme, DEBUG_ENABLED
+    global WATCH_FOLDERS, WATCH_POLL_INTERVAL
+    global scan_frame, scan_progress, scan_status_label
     
     # Hide __pycache__ directory if it exists
     pycache_dir = os.path.join(os.path.dirname(__file__), "__pycache__")
@@ -943,12 +1495,18 @@ def main() -> None:
     # Load configuration and apply settings
     config = load_config()
     FOLDER_PATH = config.get('folder_path', None)
+    SCAN_ROOTS = config.get('scan_roots', [])
+    SCAN_WORKERS = config.get('scan_workers', 8)
+    WATCH_FOLDERS = config.get('watch_folders', False)
+    WATCH_POLL_INTERVAL = config.get('watch_poll_interval', 10)
     current_theme = config.get('theme', 'light')
     DEBUG_ENABLED = config.get('debug_enabled', False)
+    apply_dlsite_prefixes(config.get('dlsite_prefixes', DEFAULT_DLSITE_PREFIXES))
     
     # Setup database
     setup_database()
-    backup_database()
+    start_backup(config.get('backup_retention'))
+    prune_journal()
     
     # Create main frame
     main_frame = ttk.Frame(root)
@@ -961,11 +1519,10 @@ def main() -> None:
     # Create table style and setup
     style.configure("marked", background="lightgreen", foreground="black")
 
-    # Create Treeview (table) first
-    table = ttk.Treeview(tree_frame, columns=("ID", "Tested", "Version"), show="headings")
-    table.heading("ID", text="DLSite ID", command=lambda: sort_table(False))  # First click will sort ascending
-    table.heading("Tested", text="Tested")
-    table.heading("Version", text="Version")
+    # Create the virtualized table first; only visible rows become Treeview items
+    table = VirtualTable(tree_frame, tuple(COLUMN_HEADINGS), format_table_row, row_sort_fields,
+                         row_tags=status_tags)
+    configure_status_tags(DARK_THEME if current_theme == 'dark' else LIGHT_THEME)
     
     # Set fixed column widths to prevent inconsistent spacing
     table.column("ID", width=150, minwidth=150)
@@ -980,6 +1537,7 @@ def main() -> None:
 
     # Bind double-click event to open edit window
     table.bind("<Double-1>", edit_id)
+    table.bind("<Control-z>", undo_last_change)
 
     # Create button frame with proper styling
     button_frame = ttk.Frame(main_frame)
@@ -992,20 +1550,37 @@ def main() -> None:
     remove_button = ttk.Button(button_frame, text="Remove Selected ID", command=remove_entry)
     remove_button.pack(side=tk.LEFT, padx=2)
 
+    undo_button = ttk.Button(button_frame, text="Undo", command=undo_last_change)
+    undo_button.pack(side=tk.LEFT, padx=2)
+
     # Add search entry with theme-aware style
     search_frame = ttk.Frame(button_frame)
     search_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
 
-    search_entry = ttk.Entry(search_frame, style='Search.TEntry')
+    # Search as you type; Return skips the debounce delay
+    search_var = tk.StringVar()
+    search_entry = ttk.Entry(search_frame, textvariable=search_var, style='Search.TEntry')
     search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
-    search_entry.bind('<Return>', lambda event: refresh_table(search_entry.get()))
+    search_var.trace_add('write', lambda *args: schedule_search(search_var.get()))
+    search_entry.bind('<Return>', lambda event: start_search(search_var.get()))
 
     settings_button = ttk.Button(button_frame, text="Settings", command=show_settings)
     settings_button.pack(side=tk.RIGHT, padx=(2, 0))
 
-    refresh_button = ttk.Button(button_frame, text="Refresh", command=refresh_table)
+    refresh_button = ttk.Button(button_frame, text="Refresh",
+                               command=lambda: refresh_table(search_entry.get(), check_folder=True,
+                                                             force_full=True))
     refresh_button.pack(side=tk.RIGHT, padx=2)
 
+    # Scan status bar, only shown while a background scan is running
+    scan_frame = ttk.Frame(main_frame)
+    scan_progress = ttk.Progressbar(scan_frame, length=200)
+    scan_progress.pack(side=tk.LEFT)
+    scan_status_label = ttk.Label(scan_frame)
+    scan_status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+    scan_cancel_button = ttk.Button(scan_frame, text="Cancel", command=cancel_scan)
+    scan_cancel_button.pack(side=tk.RIGHT)
+
     # Set minimum window size
     root.minsize(600, 400)
 
@@ -1018,11 +1593,19 @@ def main() -> None:
     center_y = int(screen_height/2 - window_height/2)
     root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
 
-    # Automatically refresh table on startup
-    refresh_table()
+    # Automatically scan the folder and fill the table on startup, newest IDs first
+    sort_table("ID", True)
+    refresh_table(check_folder=True)
+    if WATCH_FOLDERS:
+        start_folder_watcher()
 
     # Start the application
     root.mainloop()
+    
+    stop_folder_watcher()
+    stop_search_worker()
+    wait_for_backup()
+    close_connection()
 
 if __name__ == '__main__':
     main()
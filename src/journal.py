@@ -0,0 +1,228 @@
+"""
+Change journal module for DLSite Collection Helper.
+
+Triggers on dlsite_ids append every insert, delete and edit of an entry's
+ID, tested status or version to the change_journal table, with the old and
+new values. Replaying the journal backwards undoes changes, which makes
+undo and restoring the entries to an earlier time cheap compared to
+restoring a full backup. Presence statuses are derived from the scanned
+folders, so they are not journaled but recomputed after reverting.
+
+Changes made inside journal_batch are grouped under a label, like
+"Delete RJ123456", and the newest batch can be undone as a whole. A restore
+is a batch too, so it can be undone like an edit. Undos are journaled but
+cannot be undone themselves (there is no redo); undoing again steps further
+back instead.
+
+Classes:
+    UndoConflictError: Raised when entries of a batch changed after it
+
+Functions:
+    journal_batch: Context manager grouping the changes of a block into one batch
+    last_undoable_batch: Find the newest batch that can be undone
+    undo_last_batch: Undo the newest batch
+    restore_to_time: Revert all changes made after a point in time
+    journal_start: Get the time of the oldest journaled change
+    prune_journal: Delete journal entries older than a number of days
+"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Set, Tuple
+
+from config import DEBUG_ENABLED
+from database import get_connection, transaction, load_state, save_state, sync_marked_status
+
+# Changes older than this are deleted on startup; backups cover older states
+JOURNAL_KEEP_DAYS = 90
+
+# Columns of a journal entry read for reverting
+ENTRY_COLUMNS = """seq, row_id, action, old_dlsite_id, old_tested, old_version,
+                   new_dlsite_id, new_tested, new_version"""
+
+class UndoConflictError(ValueError):
+    """Raised when entries of a batch were changed by later changes."""
+
+@contextmanager
+def journal_batch(label: str, conn: Optional[sqlite3.Connection] = None,
+                  reverts: Optional[int] = None) -> Iterator[sqlite3.Cursor]:
+    """
+    Context manager grouping the changes of a block into one batch.
+
+    Runs the block in one transaction, like database.transaction. The
+    journal triggers read the current batch from the state table, which is
+    only set inside this transaction.
+
+    Args:
+        label: Description of the changes, shown when undoing them
+        conn: Connection to use, defaults to the shared connection
+        reverts: Batch undone by this batch, for undo batches
+
+    Yields:
+        sqlite3.Cursor for the transaction
+    """
+    with transaction(conn) as cursor:
+        cursor.execute(
+            "INSERT INTO journal_batches (label, started_at, reverts) VALUES (?, ?, ?)",
+            (label, time.time(), reverts)
+        )
+        save_state(cursor, "journal_batch", cursor.lastrowid)
+        yield cursor
+        save_state(cursor, "journal_batch", 0)
+
+def revert_entries(cursor: sqlite3.Cursor, entries: List[Tuple]) -> Set[int]:
+    """
+    Revert journal entries, newest first.
+
+    Args:
+        cursor: SQLite cursor object
+        entries: Journal entries with ENTRY_COLUMNS, oldest first
+
+    Returns:
+        Row IDs of the entries that were changed
+    """
+    for _, row_id, action, old_id, old_tested, old_version, *_ in reversed(entries):
+        if action == "insert":
+            cursor.execute("DELETE FROM dlsite_ids WHERE rowid = ?", (row_id,))
+        elif action == "delete":
+            # Restore the same row ID, so the row is the same entry as before
+            cursor.execute(
+                "INSERT INTO dlsite_ids (rowid, dlsite_id, tested, version) VALUES (?, ?, ?, ?)",
+                (row_id, old_id, old_tested, old_version)
+            )
+        else:
+            cursor.execute(
+                "UPDATE dlsite_ids SET dlsite_id = ?, tested = ?, version = ? WHERE rowid = ?",
+                (old_id, old_tested, old_version, row_id)
+            )
+    rowids = {entry[1] for entry in entries}
+    sync_marked_status(cursor, rowids)
+    return rowids
+
+def last_undoable_batch(cursor: sqlite3.Cursor) -> Optional[Tuple[int, str]]:
+    """
+    Find the newest batch that can be undone.
+
+    Undo batches are skipped, so undoing repeatedly steps further back.
+
+    Args:
+        cursor: SQLite cursor object
+
+    Returns:
+        Tuple of (batch, label), or None if there is nothing to undo
+    """
+    cursor.execute("""
+        SELECT batch, label FROM journal_batches
+        WHERE reverts IS NULL AND undone_by IS NULL
+        AND EXISTS (SELECT 1 FROM change_journal WHERE change_journal.batch = journal_batches.batch)
+        ORDER BY batch DESC
+        LIMIT 1
+    """)
+    return cursor.fetchone()
+
+def undo_last_batch(conn: Optional[sqlite3.Connection] = None) -> Optional[Tuple[str, Set[int]]]:
+    """
+    Undo the newest batch.
+
+    Args:
+        conn: Connection to use, defaults to the shared connection
+
+    Returns:
+        Tuple of (label of the undone batch, changed row IDs), or None if
+        there is nothing to undo
+
+    Raises:
+        UndoConflictError: If an entry of the batch was changed after it
+    """
+    conn = conn if conn is not None else get_connection()
+    cursor = conn.cursor()
+    found = last_undoable_batch(cursor)
+    if found is None:
+        return None
+    batch, label = found
+    cursor.execute(f"SELECT {ENTRY_COLUMNS} FROM change_journal WHERE batch = ? ORDER BY seq", (batch,))
+    entries = cursor.fetchall()
+
+    # Each row must still be as the batch left it, or reverting would lose later changes
+    final_values = {}
+    for _, row_id, action, *_, new_id, new_tested, new_version in entries:
+        final_values[row_id] = None if action == "delete" else (new_id, new_tested, new_version)
+    for row_id, values in final_values.items():
+        cursor.execute("SELECT dlsite_id, tested, version FROM dlsite_ids WHERE rowid = ?", (row_id,))
+        if cursor.fetchone() != values:
+            raise UndoConflictError(f"Cannot undo '{label}': its entries were changed afterwards")
+
+    with journal_batch(f"Undo {label}", conn, reverts=batch) as cursor:
+        rowids = revert_entries(cursor, entries)
+        cursor.execute("UPDATE journal_batches SET undone_by = ? WHERE batch = ?",
+                       (load_state(cursor, "journal_batch"), batch))
+    if DEBUG_ENABLED:
+        print(f"[DEBUG] Undid '{label}' - {len(entries)} changes")
+    return label, rowids
+
+def restore_to_time(timestamp: float, conn: Optional[sqlite3.Connection] = None) -> Set[int]:
+    """
+    Revert all changes made after a point in time.
+
+    The restore is one batch, so it can be undone.
+
+    Args:
+        timestamp: Unix time to restore the entries to
+        conn: Connection to use, defaults to the shared connection
+
+    Returns:
+        Row IDs that were changed
+    """
+    conn = conn if conn is not None else get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {ENTRY_COLUMNS} FROM change_journal WHERE changed_at > ? ORDER BY seq",
+                   (timestamp,))
+    entries = cursor.fetchall()
+    if not entries:
+        return set()
+    label = f"Restore to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}"
+    with journal_batch(label, conn) as cursor:
+        rowids = revert_entries(cursor, entries)
+    if DEBUG_ENABLED:
+        print(f"[DEBUG] {label} - reverted {len(entries)} changes")
+    return rowids
+
+def journal_start(cursor: sqlite3.Cursor) -> Optional[float]:
+    """
+    Get the time of the oldest journaled change.
+
+    Args:
+        cursor: SQLite cursor object
+
+    Returns:
+        Unix time of the oldest entry, or None if the journal is empty;
+        the entries cannot be restored to an earlier time
+    """
+    cursor.execute("SELECT MIN(changed_at) FROM change_journal")
+    return cursor.fetchone()[0]
+
+def prune_journal(conn: Optional[sqlite3.Connection] = None,
+                  keep_days: float = JOURNAL_KEEP_DAYS) -> int:
+    """
+    Delete journal entries older than a number of days.
+
+    Args:
+        conn: Connection to use, defaults to the shared connection
+        keep_days: Age in days of the oldest entry kept
+
+    Returns:
+        Number of journal entries deleted
+    """
+    cutoff = time.time() - keep_days * 86400
+    with transaction(conn) as cursor:
+        cursor.execute("DELETE FROM change_journal WHERE changed_at < ?", (cutoff,))
+        deleted = cursor.rowcount
+        cursor.execute("""
+            DELETE FROM journal_batches
+            WHERE started_at < ?
+            AND NOT EXISTS (SELECT 1 FROM change_journal WHERE change_journal.batch = journal_batches.batch)
+        """, (cutoff,))
+    if deleted and DEBUG_ENABLED:
+        print(f"[DEBUG] Pruned {deleted} change journal entries older than {keep_days} days")
+    return deleted
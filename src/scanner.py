@@ -0,0 +1,332 @@
+"""
+Scanner module for DLSite Collection Helper.
+
+This module reconciles the contents of the configured scan roots with the
+database. Every root is walked recursively with os.scandir, reusing the file
+type information cached on each DirEntry, and filtered through per-root
+include/exclude globs and a maximum depth.
+
+Each scan is diffed against a snapshot persisted in the database (file name,
+size and modification time per entry plus the modification time of every
+directory), so unchanged directories are not listed again and only new
+filenames are parsed. A directory modified shortly before it was listed
+could change again without its modification time changing, so its mtime is
+not trusted and it is listed again on the next scan.
+
+Directories are listed concurrently on a thread pool, which hides the
+per-listing latency of network shares, and the listings are streamed into
+the reconciliation step as they complete.
+
+Scans may run on a worker thread: progress is reported through a callback and
+a scan can be cancelled through a threading.Event, in which case nothing is
+written to the database.
+
+Classes:
+    ScanCancelled: Raised when a scan is cancelled before it finishes
+
+Functions:
+    scan_roots: Incrementally rescan all roots and update presence statuses
+    walk_directories: Walk all roots concurrently, yielding changed directory listings
+    list_directory: Stat a directory and list it if it changed since the last scan
+    matches_any: Check a path against a list of glob patterns
+"""
+
+import concurrent.futures
+import fnmatch
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from database import (
+    transaction, load_id_map, apply_marked_status, load_scan_dirs, load_scan_files,
+    load_scan_signature, save_scan_snapshot, load_present_keys, presence_status
+)
+from file_utils import (
+    parse_many, parse_cache_stats, get_dlsite_prefixes, split_dlsite_id, pack_version
+)
+
+# Number of directory entries processed between progress callbacks
+PROGRESS_INTERVAL = 250
+# Default number of directories listed concurrently
+DEFAULT_SCAN_WORKERS = 8
+# Directories modified less than this before they were listed are listed again
+# next time, since coarse mtimes (2 s on FAT) may hide later changes
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+# Recorded instead of a racy mtime, so the directory never looks unchanged
+RACY_MTIME_NS = -1
+
+class ScanCancelled(Exception):
+    """Raised when a scan is cancelled before it finishes."""
+
+def matches_any(rel_path: str, patterns: List[str]) -> bool:
+    """
+    Check a path against a list of glob patterns.
+
+    Args:
+        rel_path: Path relative to its scan root, using '/' separators
+        patterns: Glob patterns, matched against the relative path and the base name
+
+    Returns:
+        True if any pattern matches
+    """
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern)
+               for pattern in patterns)
+
+def list_directory(dir_path: str, previous_mtime_ns: Optional[int]) -> Tuple[int, Optional[List[os.DirEntry]]]:
+    """
+    Stat a directory and list it if it changed since the last scan.
+
+    Runs on the walker's thread pool, so it must not touch the database.
+
+    Args:
+        dir_path: Directory to list
+        previous_mtime_ns: Modification time recorded in the snapshot, or None
+            to list the directory regardless
+
+    Returns:
+        Tuple of (mtime to record, entries or None if the directory is
+        unchanged); the mtime is RACY_MTIME_NS if it was too recent to trust
+    """
+    dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+    if dir_mtime_ns == previous_mtime_ns:
+        return dir_mtime_ns, None
+    with os.scandir(dir_path) as entries:
+        listing = list(entries)
+    if time.time_ns() - dir_mtime_ns < RACY_MTIME_WINDOW_NS:
+        dir_mtime_ns = RACY_MTIME_NS
+    return dir_mtime_ns, listing
+
+def walk_directories(roots: List[Dict[str, Any]], dir_snapshot: Dict[str, Tuple[int, Optional[str]]],
+                     workers: int = DEFAULT_SCAN_WORKERS, debug_enabled: bool = False,
+                     cancel_event: Optional[threading.Event] = None,
+                     only_dirs: Optional[Set[str]] = None, force_full: bool = False
+                     ) -> Iterator[Tuple[str, Optional[str], int, Optional[List[os.DirEntry]], int]]:
+    """
+    Walk all roots concurrently, yielding directory listings as they complete.
+
+    Subdirectories are submitted to the pool as soon as their parent has been
+    listed, so many directories are in flight at once. Unchanged directories
+    are not listed; their subdirectories are taken from the snapshot instead.
+    Recorded directories that cannot be read are yielded as unchanged, so
+    their snapshot is kept rather than dropped.
+
+    Args:
+        roots: Scan roots as returned by file_utils.get_scan_roots
+        dir_snapshot: Directory path -> (mtime, parent) from the scan snapshot
+        workers: Number of directories listed concurrently
+        debug_enabled: Flag to enable debug logging
+        cancel_event: Optional event that aborts the walk when set
+        only_dirs: If given, recorded directories outside this set are assumed
+            unchanged without being stat'ed, e.g. when a watcher reported the changes
+        force_full: List every directory, even if its mtime matches the snapshot
+
+    Yields:
+        Tuples of (directory path, parent path, directory mtime, included file
+        entries or None if unchanged, number of entries listed)
+
+    Raises:
+        ScanCancelled: If cancel_event was set during the walk
+    """
+    # Index recorded subdirectories so unchanged directories need no listing
+    snapshot_children: Dict[str, List[str]] = {}
+    for path, (_, parent) in dir_snapshot.items():
+        if parent is not None:
+            snapshot_children.setdefault(parent, []).append(path)
+
+    submitted: Set[str] = set()
+    pending: Dict[concurrent.futures.Future, Tuple[Dict[str, Any], str, str, int, Optional[str]]] = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers),
+                                                     thread_name_prefix="scan-walker")
+
+    def submit(root: Dict[str, Any], dir_path: str, rel_dir: str, depth: int, parent: Optional[str]) -> None:
+        if dir_path in submitted:
+            return
+        submitted.add(dir_path)
+        previous = dir_snapshot.get(dir_path)
+        if previous is not None and only_dirs is not None and dir_path not in only_dirs and not force_full:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_result((previous[0], None))
+        else:
+            previous_mtime_ns = previous[0] if previous and not force_full else None
+            future = executor.submit(list_directory, dir_path, previous_mtime_ns)
+        pending[future] = (root, dir_path, rel_dir, depth, parent)
+
+    try:
+        for root in roots:
+            submit(root, root['path'], "", 0, None)
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                root, dir_path, rel_dir, depth, parent = pending.pop(future)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ScanCancelled()
+                try:
+                    dir_mtime_ns, entries = future.result()
+                except OSError as e:
+                    previous = dir_snapshot.get(dir_path)
+                    if previous is None:
+                        if debug_enabled:
+                            print(f"[DEBUG] Skipping unreadable directory {dir_path}: {e}")
+                        continue
+                    # Keep what was recorded, e.g. while a share is offline; only a
+                    # parent listed without this directory removes it
+                    if debug_enabled:
+                        print(f"[DEBUG] Keeping snapshot of unreadable directory {dir_path}: {e}")
+                    dir_mtime_ns, entries = previous[0], None
+
+                may_descend = root['max_depth'] is None or depth < root['max_depth']
+                if entries is None:
+                    if may_descend:
+                        for child in snapshot_children.get(dir_path, ()):
+                            name = os.path.basename(child)
+                            submit(root, child, f"{rel_dir}/{name}" if rel_dir else name,
+                                   depth + 1, dir_path)
+                    yield dir_path, parent, dir_mtime_ns, None, 0
+                    continue
+
+                files: List[os.DirEntry] = []
+                for entry in entries:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    # DirEntry caches the file type, so these checks cost no extra syscall
+                    if entry.is_dir(follow_symlinks=False):
+                        if may_descend and not matches_any(rel_path, root['exclude']):
+                            submit(root, entry.path, rel_path, depth + 1, dir_path)
+                    elif entry.is_file():
+                        if matches_any(rel_path, root['include']) and not matches_any(rel_path, root['exclude']):
+                            files.append(entry)
+                yield dir_path, parent, dir_mtime_ns, files, len(entries)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def scan_roots(conn: sqlite3.Connection, roots: List[Dict[str, Any]], debug_enabled: bool = False,
+               progress: Optional[Callable[[int, int, Optional[float]], None]] = None,
+               cancel_event: Optional[threading.Event] = None,
+               workers: int = DEFAULT_SCAN_WORKERS,
+               only_dirs: Optional[Set[str]] = None,
+               force_full: bool = False) -> Tuple[Set[int], Optional[float]]:
+    """
+    Incrementally rescan all roots and update presence statuses.
+
+    Every directory is stat'ed, but only directories whose modification time
+    differs from the snapshot are listed, and only files that are new since
+    the last scan are stat'ed and parsed. Listings are consumed as the
+    parallel walker produces them. Presence is then reconciled in a single
+    transaction that touches just the rows whose status changed.
+
+    Args:
+        conn: SQLite connection object
+        roots: Scan roots as returned by file_utils.get_scan_roots
+        debug_enabled: Flag to enable debug logging
+        progress: Optional callback receiving (entries processed, expected total,
+            parse cache hit rate); the total is the previous snapshot size, or 0
+            if unknown, and the hit rate is None until a filename was parsed
+        cancel_event: Optional event that aborts the scan when set
+        workers: Number of directories listed concurrently
+        only_dirs: If given, only these recorded directories are checked for changes
+        force_full: List every directory instead of trusting unchanged mtimes
+
+    Returns:
+        Tuple of (set of row IDs whose presence status changed, fraction of
+        the parsed filenames served by the parse cache, or None if none were parsed)
+
+    Raises:
+        ScanCancelled: If cancel_event was set before the results were written
+    """
+    cursor = conn.cursor()
+    # The prefixes decide which files have IDs, so changing them rescans everything
+    signature = json.dumps([roots, get_dlsite_prefixes()], sort_keys=True)
+    if load_scan_signature(cursor) == signature:
+        dir_snapshot = load_scan_dirs(cursor)
+        cursor.execute("SELECT COUNT(*) FROM scan_files")
+        expected_total = cursor.fetchone()[0]
+    else:
+        if debug_enabled:
+            print("[DEBUG] Scan configuration changed, discarding scan snapshot")
+        dir_snapshot = {}
+        expected_total = 0
+
+    dirs: List[Tuple[str, int, Optional[str]]] = []
+    upserts: List[Tuple[str, str, int, int, Optional[str], Optional[str], Optional[int],
+                        str, Optional[int]]] = []
+    removed_files: List[Tuple[str, str]] = []
+    visited: Set[str] = set()
+    processed = 0
+    next_report = PROGRESS_INTERVAL
+    cache_hits, cache_misses = parse_cache_stats()
+
+    def cache_hit_rate() -> Optional[float]:
+        hits, misses = parse_cache_stats()
+        hits, misses = hits - cache_hits, misses - cache_misses
+        return hits / (hits + misses) if hits + misses else None
+
+    for dir_path, parent, dir_mtime_ns, files, entry_count in walk_directories(
+            roots, dir_snapshot, workers, debug_enabled, cancel_event, only_dirs, force_full):
+        visited.add(dir_path)
+        if files is None:
+            continue
+
+        known_files = load_scan_files(cursor, dir_path) if dir_path in dir_snapshot else {}
+        seen: Set[str] = {entry.name for entry in files}
+        # Presence only depends on the name, so only new files are stat'ed and parsed
+        new_files = [entry for entry in files if entry.name not in known_files]
+        parsed_names = parse_many([entry.name for entry in new_files], debug_enabled)
+        for entry, (dlsite_id, version) in zip(new_files, parsed_names):
+            stat = entry.stat()
+            prefix, id_number = split_dlsite_id(dlsite_id) if dlsite_id else (None, None)
+            upserts.append((dir_path, entry.name, stat.st_size, stat.st_mtime_ns,
+                            dlsite_id, prefix, id_number, version or "", pack_version(version)))
+
+        removed_files.extend((dir_path, name) for name in known_files if name not in seen)
+        dirs.append((dir_path, dir_mtime_ns, parent))
+
+        processed += entry_count
+        if processed >= next_report:
+            next_report = processed + PROGRESS_INTERVAL
+            if progress is not None:
+                progress(processed, expected_total, cache_hit_rate())
+
+    removed_dirs = [path for path in dir_snapshot if path not in visited]
+    if cancel_event is not None and cancel_event.is_set():
+        raise ScanCancelled()
+    hit_rate = cache_hit_rate()
+    if progress is not None:
+        progress(processed, expected_total, hit_rate)
+
+    if debug_enabled:
+        print(f"\n[DEBUG] Rescanned {len(roots)} root(s): {len(visited)} directories, {len(dirs)} listed")
+        print(f"[DEBUG] {len(upserts)} new files, {len(removed_files)} removed files, "
+              f"{len(removed_dirs)} removed directories")
+        print(f"[DEBUG] Parsed {len(upserts)} new filenames, "
+              f"{hit_rate or 0.0:.0%} from the parse cache")
+
+    if not dirs and not removed_dirs:
+        return set(), hit_rate
+
+    save_scan_snapshot(conn, signature, dirs, upserts, removed_files, removed_dirs)
+
+    # Read the entries and write their statuses under one write lock, so an
+    # edit made in between is neither overwritten nor missed
+    with transaction(conn, immediate=True) as cursor:
+        # Group the versions on disk by ID, then classify every entry of those IDs
+        # as present, outdated or newer in one pass; only changed rows are written
+        disk_versions: Dict[Tuple[str, int], Set[Optional[int]]] = {}
+        for prefix, id_number, version_key in load_present_keys(cursor):
+            disk_versions.setdefault((prefix, id_number), set()).add(version_key)
+
+        id_map, current_statuses = load_id_map(cursor)
+        statuses: Dict[int, int] = {}
+        for id_key, disk_keys in disk_versions.items():
+            entries = id_map.get(id_key)
+            if not entries:
+                if debug_enabled:
+                    print(f"[DEBUG] No entry found in DB for {id_key[0]}{id_key[1]}")
+                continue
+            for rowid, version_key in entries:
+                statuses[rowid] = presence_status(version_key, disk_keys)
+
+        return apply_marked_status(cursor, statuses, current_statuses), hit_rate
@@ -0,0 +1,220 @@
+"""
+Search index module for DLSite Collection Helper.
+
+This module makes substring searches over the searchable text columns of
+dlsite_ids fast enough for very large libraries. When SQLite supports it, an
+FTS5 table with the trigram tokenizer indexes the columns and is kept in sync
+by triggers, so a search is an index lookup instead of a full table scan.
+Older SQLite builds without FTS5 or the trigram tokenizer use an in-memory
+trigram index built in Python instead, rebuilt whenever the database changed.
+Creating the FTS5 index is retried on every start, so it is picked up once
+SQLite is upgraded.
+
+Queries shorter than three characters cannot use a trigram index and fall
+back to LIKE; they match a large part of the library anyway.
+
+Classes:
+    NgramIndex: In-memory trigram index over the searchable columns
+
+Functions:
+    trigram_supported: Check whether SQLite supports FTS5 with the trigram tokenizer
+    create_fts_index: Create the FTS5 index and the triggers keeping it in sync
+    has_fts_index: Check whether the database has the FTS5 index
+    search_filter: Build an SQL condition selecting the rows matching a search
+"""
+
+import sqlite3
+import threading
+from typing import Any, Dict, List, Set, Tuple
+
+from config import DEBUG_ENABLED
+
+FTS_TABLE = "dlsite_ids_fts"
+# Columns of dlsite_ids covered by substring search; the FTS index has to be
+# recreated by a migration when this changes
+SEARCH_COLUMNS = ("dlsite_id",)
+GRAM_SIZE = 3
+
+def trigram_supported(cursor: sqlite3.Cursor) -> bool:
+    """
+    Check whether SQLite supports FTS5 with the trigram tokenizer.
+
+    Args:
+        cursor: SQLite cursor object
+
+    Returns:
+        True if an FTS5 trigram table can be created (SQLite 3.34 or newer with FTS5)
+    """
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(text, tokenize='trigram')")
+        cursor.execute("DROP TABLE temp.trigram_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def create_fts_index(cursor: sqlite3.Cursor) -> bool:
+    """
+    Create the FTS5 index and the triggers keeping it in sync.
+
+    The index is an external content table over dlsite_ids, so the text is
+    not stored twice. Does nothing if SQLite lacks FTS5 trigram support.
+
+    Args:
+        cursor: SQLite cursor object
+
+    Returns:
+        True if the index exists afterwards
+    """
+    if has_fts_index(cursor):
+        return True
+    if not trigram_supported(cursor):
+        if DEBUG_ENABLED:
+            print("[DEBUG] SQLite has no FTS5 trigram tokenizer, using the in-memory search index")
+        return False
+
+    columns = ", ".join(SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            {columns}, content='dlsite_ids', content_rowid='rowid', tokenize='trigram'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_fts_insert AFTER INSERT ON dlsite_ids BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_fts_delete AFTER DELETE ON dlsite_ids BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+        END
+    """)
+    # Only text changes touch the index, so presence updates during scans stay cheap
+    cursor.execute(f"""
+        CREATE TRIGGER dlsite_ids_fts_update AFTER UPDATE OF {columns} ON dlsite_ids BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END
+    """)
+    cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+def has_fts_index(cursor: sqlite3.Cursor) -> bool:
+    """
+    Check whether the database has the FTS5 index.
+
+    Args:
+        cursor: SQLite cursor object
+
+    Returns:
+        True if the FTS5 table exists
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+    return cursor.fetchone() is not None
+
+class NgramIndex:
+    """
+    In-memory trigram index over the searchable columns.
+
+    Maps every trigram of the lowercased column text to the rows containing
+    it. A search intersects the row sets of the query's trigrams, smallest
+    first, and verifies the few remaining candidates with a substring check.
+
+    Args:
+        conn: Connection the index is built from
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.grams: Dict[str, Set[int]] = {}
+        self.texts: Dict[int, str] = {}
+        self.version: Tuple[int, int] = (-1, -1)
+
+    def refresh(self) -> None:
+        """Rebuild the index if the database changed since it was built."""
+        # data_version changes on commits by other connections, total_changes on our own
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        version = (data_version, self.conn.total_changes)
+        if version == self.version:
+            return
+
+        grams: Dict[str, Set[int]] = {}
+        texts: Dict[int, str] = {}
+        columns = ", ".join(f"COALESCE({column}, '')" for column in SEARCH_COLUMNS)
+        for rowid, *values in self.conn.execute(f"SELECT rowid, {columns} FROM dlsite_ids"):
+            text = "\n".join(values).lower()
+            texts[rowid] = text
+            for start in range(len(text) - GRAM_SIZE + 1):
+                grams.setdefault(text[start:start + GRAM_SIZE], set()).add(rowid)
+        self.grams, self.texts, self.version = grams, texts, version
+
+    def search(self, query: str) -> Set[int]:
+        """
+        Find the rows whose searchable text contains the query.
+
+        Args:
+            query: Search string of at least GRAM_SIZE characters
+
+        Returns:
+            Set of matching row IDs
+        """
+        query = query.lower()
+        postings = []
+        for start in range(len(query) - GRAM_SIZE + 1):
+            rows = self.grams.get(query[start:start + GRAM_SIZE])
+            if not rows:
+                return set()
+            postings.append(rows)
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {rowid for rowid in candidates if query in self.texts[rowid]}
+
+# Fallback indexes per connection ID; each connection belongs to one thread
+_ngram_indexes: Dict[int, NgramIndex] = {}
+_ngram_lock = threading.Lock()
+
+def get_ngram_index(conn: sqlite3.Connection) -> NgramIndex:
+    """
+    Get the up-to-date fallback index for a connection.
+
+    Args:
+        conn: SQLite connection object
+
+    Returns:
+        The connection's NgramIndex, built or refreshed as needed
+    """
+    with _ngram_lock:
+        index = _ngram_indexes.get(id(conn))
+        if index is None or index.conn is not conn:
+            index = _ngram_indexes[id(conn)] = NgramIndex(conn)
+    index.refresh()
+    return index
+
+def search_filter(cursor: sqlite3.Cursor, query: str) -> Tuple[str, List[Any]]:
+    """
+    Build an SQL condition selecting the dlsite_ids rows matching a search.
+
+    Matches case-insensitive substrings of any searchable column, like
+    LIKE '%query%' did, but through the FTS5 trigram index or the in-memory
+    fallback index when the query is long enough.
+
+    Args:
+        cursor: SQLite cursor object
+        query: Search string
+
+    Returns:
+        Tuple of (SQL condition on dlsite_ids, parameters)
+    """
+    if len(query) < GRAM_SIZE:
+        condition = " OR ".join(f"{column} LIKE ?" for column in SEARCH_COLUMNS)
+        return f"({condition})", [f"%{query}%"] * len(SEARCH_COLUMNS)
+
+    if has_fts_index(cursor):
+        phrase = '"' + query.replace('"', '""') + '"'
+        return f"rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)", [phrase]
+
+    # The fallback serves old SQLite builds, which may lack JSON1 and allow only
+    # 999 parameters, so the integer row IDs are inlined into the condition
+    rowids = get_ngram_index(cursor.connection).search(query)
+    return f"rowid IN ({', '.join(str(int(rowid)) for rowid in sorted(rowids))})", []
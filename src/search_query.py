@@ -0,0 +1,254 @@
+"""
+Search query module for DLSite Collection Helper.
+
+This module compiles the search bar's query syntax into a single
+parameterized SQL condition on dlsite_ids. A query is a list of terms that
+must all match:
+
+    text            substring of the ID (through the trigram search index)
+    tested:yes|no   tested status
+    present:yes|no  whether the ID was found in the scanned folders with this version
+    status:outdated presence status: present, outdated (only an older version
+                    was found), newer (a newer version was found) or missing
+    version:<2.0    version comparison (<, <=, >, >=, =, !=), a range like
+                    version:1.0..2.0, or version:none for entries without one
+    type:vj         product type by ID prefix; type:rj,vj matches either
+    rj:1000000..1100000
+                    number of an ID with that prefix (any configured prefix
+                    works, e.g. vj:), exact, as a range (either end may be
+                    left open) or as a comparison like rj:>=1000000
+
+Any term can be negated with a leading '-', and text containing spaces can
+be quoted. For example, "present:no tested:no version:<2" lists missing,
+untested entries older than version 2.
+
+Classes:
+    QuerySyntaxError: Raised when a search query cannot be parsed
+
+Functions:
+    compile_query: Compile a search query into an SQL condition
+    plain_terms: Get the text terms of a query that uses no other syntax
+    can_narrow: Check whether a query's results are a subset of another's
+    matches_terms: Check a text against plain search terms
+"""
+
+import re
+import shlex
+import sqlite3
+from typing import Any, Callable, List, Optional, Tuple
+
+from search_index import search_filter
+from file_utils import get_dlsite_prefixes, pack_version
+from database import STATUS_MISSING, STATUS_PRESENT, STATUS_OUTDATED, STATUS_NEWER
+
+# Fixed fields; every configured DLSite ID prefix is a field matching its number too
+FIELDS = ("tested", "present", "marked", "status", "version", "type")
+STATUS_VALUES = {"present": STATUS_PRESENT, "current": STATUS_PRESENT, "outdated": STATUS_OUTDATED,
+                 "older": STATUS_OUTDATED, "newer": STATUS_NEWER, "missing": STATUS_MISSING}
+BOOLEAN_VALUES = {"yes": True, "y": True, "true": True, "1": True,
+                  "no": False, "n": False, "false": False, "0": False}
+COMPARISON = re.compile(r'(<=|>=|!=|<|>|=)?(.*)')
+
+class QuerySyntaxError(ValueError):
+    """Raised when a search query cannot be parsed."""
+
+def split_terms(query: str) -> List[str]:
+    """
+    Split a query into terms, honoring quotes.
+
+    Args:
+        query: Search query
+
+    Returns:
+        List of terms
+
+    Raises:
+        QuerySyntaxError: If a quote is not closed
+    """
+    try:
+        return shlex.split(query)
+    except ValueError as e:
+        raise QuerySyntaxError(str(e)) from e
+
+def parse_boolean(field: str, value: str) -> bool:
+    """Parse the value of a yes/no field."""
+    try:
+        return BOOLEAN_VALUES[value.lower()]
+    except KeyError:
+        raise QuerySyntaxError(f"{field}: expects yes or no, got '{value}'") from None
+
+def compile_comparison(field: str, value: str, column_sql: str,
+                       parse: Callable[[str], Any]) -> Tuple[str, List[Any]]:
+    """
+    Compile a comparison or range on an ordered value.
+
+    Args:
+        field: Field name, for error messages
+        value: Field value such as '5', '<5', '>=5', '1..5' or '1..'
+        column_sql: SQL expression comparing a column to '?' with the operator
+            given as '{op}', e.g. 'version_key {op} ?'
+        parse: Function converting a value to its SQL parameter, raising ValueError
+
+    Returns:
+        Tuple of (SQL condition, parameters)
+
+    Raises:
+        QuerySyntaxError: If the value cannot be parsed
+    """
+    try:
+        if ".." in value:
+            low, high = value.split("..", 1)
+            if not low and not high:
+                raise ValueError(value)
+            parts, params = [], []
+            if low:
+                parts.append(column_sql.format(op=">="))
+                params.append(parse(low))
+            if high:
+                parts.append(column_sql.format(op="<="))
+                params.append(parse(high))
+            return " AND ".join(parts), params
+
+        op, operand = COMPARISON.fullmatch(value).groups()
+        if not operand:
+            raise ValueError(value)
+        return column_sql.format(op=op or "="), [parse(operand)]
+    except ValueError:
+        raise QuerySyntaxError(f"{field}: cannot parse '{value}'") from None
+
+def parse_version(value: str) -> int:
+    """Validate a version operand and return its packed version key."""
+    value = value.strip().lower()
+    value = value[1:] if value.startswith("v") else value
+    if not re.fullmatch(r'\d+(\.\d+)*', value):
+        raise ValueError(value)
+    return pack_version(value)
+
+def is_field_term(term: str) -> bool:
+    """Check whether a term is a field term like 'tested:no' rather than text."""
+    field, sep, _ = term.partition(":")
+    return bool(sep) and (field.lower() in FIELDS or field.upper() in get_dlsite_prefixes())
+
+def compile_term(cursor: sqlite3.Cursor, term: str) -> Tuple[str, List[Any]]:
+    """
+    Compile a single query term.
+
+    Args:
+        cursor: SQLite cursor object, used for the substring search index
+        term: Query term without negation
+
+    Returns:
+        Tuple of (SQL condition, parameters)
+
+    Raises:
+        QuerySyntaxError: If a field term is malformed
+    """
+    if not is_field_term(term):
+        return search_filter(cursor, term)
+    field, _, value = term.partition(":")
+    field = field.lower()
+
+    if field == "tested":
+        return "tested = ?", ["Yes" if parse_boolean(field, value) else "No"]
+    if field in ("present", "marked"):
+        return ("marked = ?" if parse_boolean(field, value) else "marked != ?"), [STATUS_PRESENT]
+    if field == "status":
+        try:
+            statuses = [STATUS_VALUES[status.strip().lower()] for status in value.split(",")]
+        except KeyError:
+            raise QuerySyntaxError(
+                f"status: expects {', '.join(STATUS_VALUES)}, got '{value}'") from None
+        return f"marked IN ({', '.join('?' * len(statuses))})", statuses
+    if field == "version":
+        if value.lower() in ("none", "-", ""):
+            return "version_key IS NULL", []
+        # Integer comparisons on the packed key; entries without a version never match
+        condition, params = compile_comparison(field, value, "version_key {op} ?", parse_version)
+        return f"version_key IS NOT NULL AND {condition}", params
+    if field == "type":
+        prefixes = [prefix.strip().upper() for prefix in value.split(",") if prefix.strip()]
+        if not prefixes:
+            raise QuerySyntaxError("type: expects a prefix like rj or vj")
+        return f"prefix IN ({', '.join('?' * len(prefixes))})", prefixes
+
+    # DLSite ID number, a range scan on the (prefix, id_number) index
+    condition, params = compile_comparison(field, value, "id_number {op} ?", int)
+    return f"prefix = ? AND {condition}", [field.upper()] + params
+
+def compile_query(cursor: sqlite3.Cursor, query: str) -> Tuple[str, List[Any]]:
+    """
+    Compile a search query into an SQL condition.
+
+    Args:
+        cursor: SQLite cursor object, used for the substring search index
+        query: Search query as typed into the search bar
+
+    Returns:
+        Tuple of (SQL condition on dlsite_ids, parameters); the condition is
+        '1' for an empty query
+
+    Raises:
+        QuerySyntaxError: If the query is malformed
+    """
+    parts: List[str] = []
+    params: List[Any] = []
+    for term in split_terms(query):
+        negate = term.startswith("-") and len(term) > 1
+        condition, term_params = compile_term(cursor, term[1:] if negate else term)
+        parts.append(f"NOT ({condition})" if negate else f"({condition})")
+        params.extend(term_params)
+    return (" AND ".join(parts) or "1"), params
+
+def plain_terms(query: str) -> Optional[List[str]]:
+    """
+    Get the text terms of a query that uses no other syntax.
+
+    Args:
+        query: Search query
+
+    Returns:
+        Lowercased substring terms, or None if the query has field terms,
+        negations or cannot be parsed
+    """
+    try:
+        terms = split_terms(query)
+    except QuerySyntaxError:
+        return None
+    for term in terms:
+        if term.startswith("-") or is_field_term(term):
+            return None
+    return [term.lower() for term in terms]
+
+def can_narrow(old_query: str, new_query: str) -> bool:
+    """
+    Check whether a query's results are a subset of another query's results.
+
+    True when both are plain text queries and every term of the old query
+    is contained in a term of the new one, so the new results can be found
+    by filtering the old ones in memory.
+
+    Args:
+        old_query: Query whose results are available
+        new_query: Query to run
+
+    Returns:
+        True if the new results can be filtered from the old ones
+    """
+    old_terms, new_terms = plain_terms(old_query), plain_terms(new_query)
+    if old_terms is None or new_terms is None:
+        return False
+    return all(any(old in new for new in new_terms) for old in old_terms)
+
+def matches_terms(text: str, terms: List[str]) -> bool:
+    """
+    Check a text against plain search terms.
+
+    Args:
+        text: Text to search in
+        terms: Lowercased terms as returned by plain_terms
+
+    Returns:
+        True if the text contains every term, ignoring case
+    """
+    text = text.lower()
+    return all(term in text for term in terms)
@@ -12,6 +12,8 @@ Color Schemes:
 Display Markers:
     - PRESENT_MARKER (✓): Indicates a file is present in the collection
     - MISSING_MARKER (✗): Indicates a file is missing from the collection
+    - OUTDATED_MARKER (↓): Indicates only an older version is in the collection
+    - NEWER_MARKER (↑): Indicates a newer version is in the collection
 """
 
 # Theme colors and styling configurations
@@ -26,7 +28,9 @@ LIGHT_THEME = {
     'button_fg': '#000000',
     'highlight_bg': '#e5f3ff',  # For highlighted elements
     'highlight_fg': '#000000',
-    'border': '#cccccc'  # Light gray border
+    'border': '#cccccc',  # Light gray border
+    'outdated_fg': '#b35900',  # Orange for rows with only an older copy
+    'newer_fg': '#0b5cad'  # Blue for rows with a newer copy
 }
 
 DARK_THEME = {
@@ -40,9 +44,13 @@ DARK_THEME = {
     'button_fg': '#ffffff',
     'highlight_bg': '#404859',  # For highlighted elements
     'highlight_fg': '#ffffff',
-    'border': '#404040'  # Dark gray border
+    'border': '#404040',  # Dark gray border
+    'outdated_fg': '#ffad5c',
+    'newer_fg': '#7cb8f2'
 }
 
 # Constants for display
 PRESENT_MARKER = "✓"  # Check mark (U+2713)
 MISSING_MARKER = "✗"  # Ballot X (U+2717)
+OUTDATED_MARKER = "↓"  # Downwards arrow (U+2193)
+NEWER_MARKER = "↑"  # Upwards arrow (U+2191)
@@ -0,0 +1,455 @@
+"""
+Table view module for DLSite Collection Helper.
+
+This module provides a virtualized table on top of ttk.Treeview. The full
+result set lives in a compact, sorted Python list, and only the rows in the
+visible window (plus a small overscan) exist as Treeview items. Scrolling
+reassigns the values of this fixed pool of items instead of creating or
+moving thousands of them, so memory use and redraw cost stay flat no matter
+how large the library grows.
+
+Updates are applied as row-level diffs against the model, so an edit or a
+reload touches only the rows that changed and keeps the scroll position and
+selection.
+
+Classes:
+    VirtualTable: Treeview that only materializes the visible rows of a row model
+"""
+
+import bisect
+import tkinter as tk
+from tkinter import ttk
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Rows rendered beyond the bottom edge, so partially visible rows are filled
+OVERSCAN = 3
+# Diffs larger than this are applied with a single sort
+BULK_THRESHOLD = 1000
+# Rows scrolled per mouse wheel notch
+WHEEL_ROWS = 3
+# Fallback geometry until the first rendered row can be measured
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_HEADING_HEIGHT = 24
+
+Row = Tuple[Any, ...]
+
+class VirtualTable:
+    """
+    Treeview that only materializes the visible rows of a row model.
+
+    Rows are tuples whose first element is the unique row ID. The sort fields
+    of every row are computed once when the row enters the table, and rows
+    are kept sorted by the selected fields followed by the row ID, so single
+    rows can be inserted, moved and removed with a binary search. Sorting on
+    other fields only rebuilds the keys from the cached fields and runs one
+    list sort. Descending order is shown by reading the same list from the
+    end, which makes toggling the direction free.
+
+    Args:
+        parent: Widget to create the table in
+        columns: Column identifiers of the Treeview
+        format_values: Function turning a row into the displayed column values
+        sort_fields: Function returning the sortable fields of a row
+        sort_order: Indexes into the sort fields, from primary to last tie breaker
+        row_tags: Optional function returning the Treeview tags of a row, which
+            are styled with tag_configure
+    """
+
+    def __init__(self, parent: tk.Widget, columns: Tuple[str, ...],
+                 format_values: Callable[[Row], Tuple[str, ...]],
+                 sort_fields: Callable[[Row], Tuple[Any, ...]],
+                 sort_order: Sequence[int] = (0,),
+                 row_tags: Optional[Callable[[Row], Tuple[str, ...]]] = None):
+        self.format_values = format_values
+        self.row_tags = row_tags
+        self.sort_fields = sort_fields
+        self.sort_order = tuple(sort_order)
+        self.reverse = False
+
+        # Sorted row model with a parallel list of keys for bisecting
+        self.rows: List[Row] = []
+        self.keys: List[Tuple[Any, ...]] = []
+        self.row_keys: Dict[Any, Tuple[Any, ...]] = {}
+        self.row_fields: Dict[Any, Tuple[Any, ...]] = {}
+
+        # Visible window and the pool of Treeview items showing it
+        self.offset = 0
+        self.visible_rows = 1
+        self.row_height = DEFAULT_ROW_HEIGHT
+        self.heading_height = DEFAULT_HEADING_HEIGHT
+        self.measured = False
+        self.slots: List[str] = []
+        self.slot_rows: List[Optional[Row]] = []
+        self.selected_rowid: Optional[Any] = None
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(WHEEL_ROWS))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.visible_rows))
+        self.tree.bind("<Home>", lambda event: self.move_selection(-len(self.rows)))
+        self.tree.bind("<End>", lambda event: self.move_selection(len(self.rows)))
+
+    # Geometry and Treeview passthrough
+
+    def pack(self, **kwargs: Any) -> None:
+        """Pack the table and its scrollbar."""
+        self.frame.pack(**kwargs)
+
+    def heading(self, column: str, **kwargs: Any) -> Any:
+        """Configure a column heading of the underlying Treeview."""
+        return self.tree.heading(column, **kwargs)
+
+    def column(self, column: str, **kwargs: Any) -> Any:
+        """Configure a column of the underlying Treeview."""
+        return self.tree.column(column, **kwargs)
+
+    def bind(self, sequence: str, func: Callable[[tk.Event], Any]) -> str:
+        """Bind an event on the underlying Treeview."""
+        return self.tree.bind(sequence, func, add="+")
+
+    def tag_configure(self, tag: str, **kwargs: Any) -> Any:
+        """Configure the style of a row tag of the underlying Treeview."""
+        return self.tree.tag_configure(tag, **kwargs)
+
+    # Row model
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def make_key(self, row: Row) -> Tuple[Any, ...]:
+        """Compute and cache the sort fields of a row and build its full sort key."""
+        fields = self.sort_fields(row)
+        self.row_fields[row[0]] = fields
+        return self.key_from_fields(fields, row[0])
+
+    def key_from_fields(self, fields: Tuple[Any, ...], rowid: Any) -> Tuple[Any, ...]:
+        """Build a sort key from cached fields, using the row ID as final tie breaker."""
+        return tuple(fields[index] for index in self.sort_order) + (rowid,)
+
+    def index_of(self, rowid: Any) -> Optional[int]:
+        """Find the position of a row in the sorted model, or None if absent."""
+        key = self.row_keys.get(rowid)
+        if key is None:
+            return None
+        return bisect.bisect_left(self.keys, key)
+
+    def display_index(self, index: int) -> int:
+        """Convert between model positions and displayed positions."""
+        return len(self.rows) - 1 - index if self.reverse else index
+
+    def row_at(self, position: int) -> Row:
+        """Get the row shown at a displayed position."""
+        return self.rows[self.display_index(position)]
+
+    def get_row(self, rowid: Any) -> Optional[Row]:
+        """Get a row by its row ID, or None if it is not in the table."""
+        index = self.index_of(rowid)
+        return None if index is None else self.rows[index]
+
+    def set_rows(self, rows: Iterable[Row]) -> None:
+        """
+        Replace all rows of the table.
+
+        Args:
+            rows: Rows to show, in any order
+        """
+        self.row_fields = {}
+        decorated = sorted((self.make_key(row), row) for row in rows)
+        self.keys = [key for key, _ in decorated]
+        self.rows = [row for _, row in decorated]
+        self.row_keys = {row[0]: key for key, row in decorated}
+        if self.selected_rowid not in self.row_keys:
+            self.selected_rowid = None
+        self.offset = 0
+        self.render()
+
+    def sync_rows(self, rows: Iterable[Row]) -> Tuple[List[Any], List[Any], List[Any]]:
+        """
+        Bring the table in line with a new result set by applying only the diff.
+
+        Rows are compared by row ID and value, so unchanged rows are neither
+        re-sorted nor redrawn, and the scroll position and selection survive
+        the update.
+
+        Args:
+            rows: The complete new result set, in any order
+
+        Returns:
+            Tuple of (inserted, deleted, changed) row IDs
+        """
+        new_rows = {row[0]: row for row in rows}
+        current = {row[0]: row for row in self.rows}
+        deleted = [rowid for rowid in current if rowid not in new_rows]
+        inserted = [rowid for rowid in new_rows if rowid not in current]
+        changed = [rowid for rowid, row in new_rows.items()
+                   if rowid in current and current[rowid] != row]
+
+        anchor = self.top_rowid()
+        if len(inserted) + len(changed) + len(deleted) > BULK_THRESHOLD:
+            # Large diffs are cheaper as one sort than as many list inserts;
+            # keys of unchanged rows are reused
+            stale = set(changed)
+            stale.update(deleted)
+            for rowid in stale:
+                del self.row_fields[rowid]
+            decorated = sorted(
+                (self.row_keys[rowid] if rowid in self.row_fields else self.make_key(row), row)
+                for rowid, row in new_rows.items())
+            self.keys = [key for key, _ in decorated]
+            self.rows = [row for _, row in decorated]
+            self.row_keys = {row[0]: key for key, row in decorated}
+        else:
+            for rowid in deleted:
+                self.remove_from_model(rowid)
+            for rowid in inserted + changed:
+                self.upsert_into_model(new_rows[rowid])
+        if self.selected_rowid not in self.row_keys:
+            self.selected_rowid = None
+        self.restore_anchor(anchor)
+        return inserted, deleted, changed
+
+    def upsert_rows(self, rows: Iterable[Row]) -> None:
+        """
+        Insert new rows or replace existing rows with the same row ID.
+
+        Each row costs two binary searches, independent of the table size
+        apart from the list memmove.
+
+        Args:
+            rows: Rows to insert or update
+        """
+        anchor = self.top_rowid()
+        for row in rows:
+            self.upsert_into_model(row)
+        self.restore_anchor(anchor)
+
+    def remove_rows(self, rowids: Iterable[Any]) -> None:
+        """
+        Remove rows from the table.
+
+        Args:
+            rowids: Row IDs to remove; unknown IDs are ignored
+        """
+        anchor = self.top_rowid()
+        for rowid in rowids:
+            self.remove_from_model(rowid)
+            if rowid == self.selected_rowid:
+                self.selected_rowid = None
+        self.restore_anchor(anchor)
+
+    def upsert_into_model(self, row: Row) -> None:
+        """Insert or replace a single row in the sorted model without redrawing."""
+        key = self.make_key(row)
+        index = self.index_of(row[0])
+        if index is not None and self.keys[index] == key:
+            # Same position, so the row can be replaced in place
+            self.rows[index] = row
+            return
+        # Removing the old entry drops the cached fields, so cache them again
+        fields = self.row_fields[row[0]]
+        self.remove_from_model(row[0])
+        self.row_fields[row[0]] = fields
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.rows.insert(index, row)
+        self.row_keys[row[0]] = key
+
+    def remove_from_model(self, rowid: Any) -> None:
+        """Remove a single row from the sorted model without redrawing."""
+        index = self.index_of(rowid)
+        if index is not None:
+            del self.keys[index]
+            del self.rows[index]
+            del self.row_keys[rowid]
+            del self.row_fields[rowid]
+
+    def top_rowid(self) -> Optional[Any]:
+        """Get the row ID of the first visible row, or None if the table is empty."""
+        if self.offset >= len(self.rows):
+            return None
+        return self.row_at(self.offset)[0]
+
+    def restore_anchor(self, anchor: Optional[Any]) -> None:
+        """
+        Redraw, keeping the given row at the top so rows inserted or removed
+        above the visible window don't make the view jump.
+        """
+        index = self.index_of(anchor) if anchor is not None and self.offset else None
+        if index is not None:
+            self.offset = self.display_index(index)
+        self.render()
+
+    def set_sort(self, sort_order: Sequence[int], reverse: bool) -> None:
+        """
+        Change the sort order of the table.
+
+        The keys are rebuilt from the cached sort fields and sorted once;
+        only changing the direction does not re-sort anything.
+
+        Args:
+            sort_order: Indexes into the sort fields, from primary to last tie breaker
+            reverse: Whether to show rows in descending order
+        """
+        sort_order = tuple(sort_order)
+        if sort_order == self.sort_order and reverse == self.reverse:
+            return
+        if sort_order != self.sort_order:
+            self.sort_order = sort_order
+            decorated = sorted(
+                (self.key_from_fields(self.row_fields[row[0]], row[0]), row) for row in self.rows)
+            self.keys = [key for key, _ in decorated]
+            self.rows = [row for _, row in decorated]
+            self.row_keys = {row[0]: key for key, row in decorated}
+        self.reverse = reverse
+        self.offset = 0
+        if self.selected_rowid is not None:
+            self.select(self.selected_rowid)
+        else:
+            self.render()
+
+    # Selection
+
+    def selection(self) -> List[Any]:
+        """Get the row IDs of the selected rows."""
+        return [] if self.selected_rowid is None else [self.selected_rowid]
+
+    def select(self, rowid: Any) -> None:
+        """Select a row and scroll it into view."""
+        index = self.index_of(rowid)
+        if index is None:
+            return
+        self.selected_rowid = rowid
+        self.see(self.display_index(index))
+
+    def on_select(self, event: tk.Event) -> None:
+        """Track the selected row, since Treeview items are reused while scrolling."""
+        selected = self.tree.selection()
+        # An empty selection only means the selected row scrolled out of view
+        if selected and selected[0] in self.slots:
+            row = self.slot_rows[self.slots.index(selected[0])]
+            if row is not None:
+                self.selected_rowid = row[0]
+
+    def move_selection(self, delta: int) -> str:
+        """Move the selection by a number of rows, scrolling as needed."""
+        if not self.rows:
+            return "break"
+        index = self.index_of(self.selected_rowid) if self.selected_rowid is not None else None
+        if index is None:
+            position = self.offset if delta > 0 else self.offset + self.visible_rows - 1
+        else:
+            position = self.display_index(index) + delta
+        position = max(0, min(position, len(self.rows) - 1))
+        self.selected_rowid = self.row_at(position)[0]
+        self.see(position)
+        return "break"
+
+    # Scrolling
+
+    def see(self, position: int) -> None:
+        """Scroll so the given displayed position is visible, then redraw."""
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.visible_rows:
+            self.offset = position - self.visible_rows + 1
+        self.render()
+
+    def scroll(self, rows: int) -> None:
+        """Scroll the visible window by a number of rows."""
+        self.offset += rows
+        self.render()
+
+    def yview(self, *args: str) -> None:
+        """Handle scrollbar commands ('moveto' fraction or 'scroll' n units/pages)."""
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self.offset += amount
+        self.render()
+
+    def on_mousewheel(self, event: tk.Event) -> str:
+        """Scroll on mouse wheel events (Windows and macOS)."""
+        notches = -event.delta // 120 if abs(event.delta) >= 120 else (-1 if event.delta > 0 else 1)
+        self.scroll(notches * WHEEL_ROWS)
+        return "break"
+
+    def on_configure(self, event: tk.Event) -> None:
+        """Resize the item pool when the table is resized."""
+        self.update_visible_rows(event.height)
+        self.render()
+
+    def update_visible_rows(self, height: int) -> None:
+        """Compute how many rows fit into the given Treeview height."""
+        self.visible_rows = max(1, (height - self.heading_height) // self.row_height)
+
+    # Rendering
+
+    def render(self) -> None:
+        """
+        Show the visible window of rows in the Treeview item pool.
+
+        Items are only created or deleted when the window size changes, and
+        only items whose row changed are updated.
+        """
+        total = len(self.rows)
+        self.offset = max(0, min(self.offset, total - self.visible_rows))
+        count = max(0, min(self.visible_rows + OVERSCAN, total - self.offset))
+
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert("", "end"))
+            self.slot_rows.append(None)
+        while len(self.slots) > count:
+            self.tree.delete(self.slots.pop())
+            self.slot_rows.pop()
+
+        selected_slot = None
+        for position, slot in enumerate(self.slots):
+            row = self.row_at(self.offset + position)
+            if self.slot_rows[position] != row:
+                tags = self.row_tags(row) if self.row_tags is not None else ()
+                self.tree.item(slot, values=self.format_values(row), tags=tags)
+                self.slot_rows[position] = row
+            if row[0] == self.selected_rowid:
+                selected_slot = slot
+
+        if selected_slot is not None:
+            self.tree.selection_set(selected_slot)
+            self.tree.focus(selected_slot)
+        elif self.tree.selection():
+            self.tree.selection_set(())
+        self.tree.yview_moveto(0)
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+        self.measure()
+
+    def measure(self) -> None:
+        """Measure the real row and heading height once the first row is drawn."""
+        if self.measured or not self.slots:
+            return
+        bbox = self.tree.bbox(self.slots[0])
+        if not bbox:
+            return
+        self.measured = True
+        self.heading_height, self.row_height = bbox[1], max(1, bbox[3])
+        visible_rows = self.visible_rows
+        self.update_visible_rows(self.tree.winfo_height())
+        if self.visible_rows != visible_rows:
+            self.render()
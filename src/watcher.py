@@ -0,0 +1,200 @@
+"""
+Folder watcher module for DLSite Collection Helper.
+
+This module watches the scanned directories for files being created, deleted
+or renamed, so presence markers stay correct without a manual refresh. On
+Linux it uses inotify through ctypes; everywhere else, or if inotify is not
+available, it falls back to polling the modification times recorded in the
+scan snapshot, which costs one stat per directory per interval.
+
+Watchers never touch the database or the GUI themselves. Bursts of events are
+coalesced and reported as a set of changed directories on a queue, which the
+GUI turns into a single incremental scan of just those directories.
+
+Classes:
+    FolderWatcher: Background watcher reporting changed directories
+"""
+
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from config import DEBUG_ENABLED
+
+# inotify event flags (see <sys/inotify.h>)
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+# Same value as O_NONBLOCK; os has no O_NONBLOCK on Windows, where inotify is not loaded
+IN_NONBLOCK = getattr(os, "O_NONBLOCK", 0)
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+
+def load_inotify() -> Optional[ctypes.CDLL]:
+    """
+    Load the C library functions needed for inotify.
+
+    Returns:
+        The C library if inotify is available on this platform, otherwise None
+    """
+    if not hasattr(os, "O_NONBLOCK"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError, TypeError):
+        return None
+
+class FolderWatcher:
+    """
+    Background watcher reporting changed directories.
+
+    Changed directories are collected until no new event arrived for
+    quiet_period seconds (or max_delay seconds passed since the first one),
+    then put on the events queue as one set. None is put on the queue instead
+    when events were lost and a full rescan is needed.
+
+    Args:
+        events: Queue receiving sets of changed directory paths
+        quiet_period: Seconds without events before a burst is reported
+        max_delay: Maximum seconds a change is held back while events keep arriving
+        poll_interval: Seconds between checks when polling
+        force_polling: Use polling even if inotify is available
+    """
+
+    def __init__(self, events: "queue.Queue[Optional[Set[str]]]", quiet_period: float = 0.5,
+                 max_delay: float = 3.0, poll_interval: float = 10.0, force_polling: bool = False):
+        self.events = events
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.libc = None if force_polling else load_inotify()
+        self.backend = "inotify" if self.libc is not None else "polling"
+        self.dirs: Dict[str, Optional[int]] = {}
+        self.dirs_changed = True
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def update_dirs(self, dirs: Dict[str, int]) -> None:
+        """
+        Replace the set of watched directories.
+
+        Args:
+            dirs: Directory path -> modification time, usually from the scan snapshot
+        """
+        with self.lock:
+            self.dirs = dict(dirs)
+            self.dirs_changed = True
+
+    def start(self) -> None:
+        """Start watching on a daemon thread."""
+        target = self.run_inotify if self.backend == "inotify" else self.run_polling
+        self.thread = threading.Thread(target=target, name="folder-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop watching; pending changes that were not reported yet are dropped."""
+        self.stop_event.set()
+
+    def run_polling(self) -> None:
+        """Compare directory modification times against the snapshot every poll_interval."""
+        while not self.stop_event.wait(self.poll_interval):
+            with self.lock:
+                dirs = list(self.dirs.items())
+            changed: Dict[str, Optional[int]] = {}
+            for path, mtime_ns in dirs:
+                try:
+                    current = os.stat(path).st_mtime_ns
+                except OSError:
+                    # A vanished directory shows up as a change of its parent
+                    current = None
+                if current != mtime_ns:
+                    changed[path] = current
+            if changed:
+                # Remember what was reported so the same change isn't reported twice
+                with self.lock:
+                    for path, current in changed.items():
+                        if path in self.dirs:
+                            self.dirs[path] = current
+                self.events.put(set(changed))
+
+    def run_inotify(self) -> None:
+        """Read inotify events and report coalesced bursts of changed directories."""
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            if DEBUG_ENABLED:
+                print(f"[DEBUG] inotify unavailable (errno {ctypes.get_errno()}), polling instead")
+            self.backend = "polling"
+            self.run_polling()
+            return
+
+        watches: Dict[int, str] = {}
+        watched: Dict[str, int] = {}
+        changed: Set[str] = set()
+        overflow = False
+        first_event_at = last_event_at = 0.0
+        try:
+            while not self.stop_event.is_set():
+                with self.lock:
+                    if self.dirs_changed:
+                        wanted = set(self.dirs)
+                        self.dirs_changed = False
+                    else:
+                        wanted = None
+                if wanted is not None:
+                    for path in set(watched) - wanted:
+                        self.libc.inotify_rm_watch(fd, watched.pop(path))
+                    for path in wanted - set(watched):
+                        wd = self.libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK)
+                        if wd >= 0:
+                            watched[path] = wd
+                            watches[wd] = path
+
+                readable, _, _ = select.select([fd], [], [], self.quiet_period / 2)
+                if readable:
+                    data = os.read(fd, 64 * 1024)
+                    offset = 0
+                    while offset + EVENT_HEADER.size <= len(data):
+                        wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+                        offset += EVENT_HEADER.size + name_len
+                        if mask & IN_Q_OVERFLOW:
+                            overflow = True
+                        elif mask & IN_IGNORED:
+                            path = watches.pop(wd, None)
+                            if path is not None and watched.get(path) == wd:
+                                del watched[path]
+                        elif wd in watches:
+                            changed.add(watches[wd])
+                    now = time.monotonic()
+                    if not first_event_at:
+                        first_event_at = now
+                    last_event_at = now
+
+                now = time.monotonic()
+                if first_event_at and (now - last_event_at >= self.quiet_period or
+                                       now - first_event_at >= self.max_delay):
+                    self.events.put(None if overflow else changed)
+                    changed = set()
+                    overflow = False
+                    first_event_at = last_event_at = 0.0
+        finally:
+            os.close(fd)